@@ -1,17 +1,55 @@
 import os
-import nibabel as nib
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy import ndimage
 from pyfeats import glcm_features
+import result_cache
+from result_cache import cached
+from lits_io import load_ct, load_segmentation, load_ct_slice, load_segmentation_slice, voxel_volume_ml, zooms_volume_ml
+from case_stats import plot_histogram
+from volume_cache import VolumeCache
+from manifest import build_manifest, case_ids_with, case_path
+from case_iterator import CasePrefetcher, manifest_case_bytes
+from liver_roi import load_cropped_case
+from lesion_index import load_lesion_index
+from lesion_stats import lesion_table, lesion_rows
+from tumor_scan import scan_tumor_cases
+from slice_index import read_slice_index, has_tumor
 
 print("Dependencies loaded successfully!")
 
 # === Path setup ===
 data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training Dataset'
 
-# === List all segmentation files ===
-seg_files = sorted([f for f in os.listdir(data_folder) if 'segmentation' in f and (f.endswith('.nii') or f.endswith('.nii.gz'))])
+# === Optional memory-mapped cache of uncompressed volumes (None disables it) ===
+cache_folder = None  # e.g. r'C:\LiTS-Cache'
+cache = VolumeCache(cache_folder) if cache_folder else None
+
+# === Threads used to inflate block-indexed .nii.gz files (see recompress-dataset.py) ===
+read_workers = 8
+
+# === Read-ahead: load the next cases in the background while the current one is analyzed ===
+prefetch_depth = 2
+prefetch_max_bytes = 4 * 1024 ** 3  # Memory budget for all cases held at once
+
+# === Optional cache of per-case analysis results (None disables it) ===
+result_cache_folder = None  # e.g. r'C:\LiTS-Results'
+result_cache.configure(result_cache_folder)
+
+# === Optional liver ROI crops: analyze only the liver+tumor bounding box (None disables it) ===
+crop_folder = None  # e.g. r'C:\LiTS-ROI'
+
+# === Folder for the lesion index sidecars (None stores them next to each segmentation) ===
+lesion_index_folder = None
+
+# === File remembering which segmentations contain tumor (None rescans every run) ===
+tumor_scan_file = None  # e.g. r'C:\LiTS-Cache\tumor_scan.json'
+
+# === Folder of the per-slice label index sidecars (None looks next to each segmentation) ===
+slice_index_folder = None
+
+# === Look up segmentation files by case ID (header-only manifest) ===
+manifest = build_manifest(data_folder)
+seg_case_ids = case_ids_with(manifest, 'segmentation')
 
 # === Texture features using PyFeats ===
 def compute_texture_features(region):
@@ -31,64 +69,82 @@ def compute_texture_features(region):
         print(f"Error computing texture features: {e}")
         return None, None, None, None, None
 
+# === Load a segmentation and (optionally) its CT volume ===
+def load_lesion_case(segmentation_path, volume_path=None):
+    segmentation, seg_img = load_segmentation(segmentation_path, cache, read_workers)
+    volume = load_ct(volume_path, cache, read_workers)[0] if volume_path else None
+    return segmentation, volume, voxel_volume_ml(seg_img)
+
+# === Per-lesion HU statistics, histogram and texture (cached per input files) ===
+# Returns a columnar table (see lesion_stats): lesions come from the precomputed lesion
+# index and every statistic of every lesion from one set of labeled reductions, the
+# volume is loaded once per case
+@cached(paths=('segmentation_path', 'volume_path'), version=4)
+def lesion_features(segmentation_path, volume_path=None):
+    offset = (0, 0, 0)
+    if crop_folder is not None and volume_path:
+        # Every lesion lies inside the liver ROI crop; `offset` maps it back to the full volume
+        crop = load_cropped_case(volume_path, segmentation_path, crop_folder, cache=cache, workers=read_workers)
+        segmentation, volume, offset = crop.segmentation, crop.ct, crop.offset
+        voxel_ml = zooms_volume_ml(crop.zooms)
+    else:
+        segmentation, volume, voxel_ml = load_lesion_case(segmentation_path, volume_path)
+
+    # Connected components come from the precomputed lesion index (built once per file)
+    lesions = load_lesion_index(segmentation_path, lesion_index_folder, segmentation, offset=offset)['lesions']
+    table, regions = lesion_table(lesions, segmentation, volume, voxel_ml, bins=50, offset=offset)
+
+    # Texture from the central slice of each lesion's bounding box
+    z_centers = (table['bbox'][:, 2, 1] - table['bbox'][:, 2, 0]) // 2
+    textures = []
+    for region, z_center in zip(regions, z_centers):
+        lesion_2d = region[:, :, z_center].astype(np.uint8)
+        textures.append(compute_texture_features(lesion_2d))
+    table['z_center'] = z_centers
+    table['texture'] = textures
+    return table
+
+# === Interpretation of lesion HU values ===
+def classify_lesion(mean_hu):
+    if mean_hu < 0:
+        return 'Cyst (Low HU)'
+    elif mean_hu < 50:
+        return 'Benign Tumor (Low HU)'
+    return 'Malignant Tumor (High HU)'
+
 # === Analyze HU and lesion features ===
 def analyze_hu_and_lesion_features(segmentation_path, volume_path=None):
     try:
-        seg_img = nib.load(segmentation_path)
-        segmentation = seg_img.get_fdata()
-
-        # Label connected components
-        labeled_segmentation, num_features = ndimage.label(segmentation > 0)
-        objects = ndimage.find_objects(labeled_segmentation)
+        features = lesion_features(segmentation_path, volume_path)
 
         lesion_stats = []
 
-        for i, slice_tuple in enumerate(objects):
-            lesion_region = labeled_segmentation[slice_tuple] == (i + 1)
-
-            if volume_path:
-                vol_img = nib.load(volume_path)
-                volume = vol_img.get_fdata()
-                lesion_volume = volume[slice_tuple]
-                hu_values = lesion_volume[lesion_region]
-
-                lesion_mean_hu = np.mean(hu_values)
-                lesion_std_hu = np.std(hu_values)
-                lesion_min_hu = np.min(hu_values)
-                lesion_max_hu = np.max(hu_values)
+        for entry in lesion_rows(features):
+            if 'mean_hu' in entry:
+                lesion_mean_hu = entry['mean_hu']
 
                 lesion_stats.append({
                     'mean_hu': lesion_mean_hu,
-                    'std_hu': lesion_std_hu,
-                    'min_hu': lesion_min_hu,
-                    'max_hu': lesion_max_hu
+                    'std_hu': entry['std_hu'],
+                    'min_hu': entry['min_hu'],
+                    'max_hu': entry['max_hu'],
+                    'volume_ml': entry['volume_ml']
                 })
 
                 # Histogram
                 plt.figure(figsize=(8, 6))
-                plt.hist(hu_values.flatten(), bins=50, color='blue', alpha=0.7)
+                plot_histogram(plt.gca(), entry['hist_counts'], entry['hist_edges'], color='blue', alpha=0.7)
                 plt.title(f'Lesion HU Distribution (Mean HU: {lesion_mean_hu:.2f})')
                 plt.xlabel('Hounsfield Units (HU)')
                 plt.ylabel('Frequency')
                 plt.show()
 
                 # Classification
-                if lesion_mean_hu < 0:
-                    lesion_type = 'Cyst (Low HU)'
-                elif lesion_mean_hu < 50:
-                    lesion_type = 'Benign Tumor (Low HU)'
-                else:
-                    lesion_type = 'Malignant Tumor (High HU)'
-                print(f"Lesion Type: {lesion_type}")
-
-            # Texture from the central slice
-            lesion_3d = lesion_region.astype(np.uint8)
-            z_center = lesion_3d.shape[2] // 2
-            lesion_2d = lesion_3d[:, :, z_center]
-
-            contrast, dissimilarity, homogeneity, energy, correlation = compute_texture_features(lesion_2d)
-
-            print(f"Lesion {i + 1} - Texture Features:")
+                print(f"Lesion Type: {classify_lesion(lesion_mean_hu)}")
+
+            contrast, dissimilarity, homogeneity, energy, correlation = entry['texture']
+
+            print(f"Lesion {entry['lesion']} - Texture Features:")
             print(f"  Contrast: {contrast:.2f}")
             print(f"  Dissimilarity: {dissimilarity:.2f}")
             print(f"  Homogeneity: {homogeneity:.2f}")
@@ -102,85 +158,94 @@ def analyze_hu_and_lesion_features(segmentation_path, volume_path=None):
         return []
 
 # === Analyze HU and lesion features with visualization ===
-def analyze_hu_and_lesion_features_with_visualization(segmentation_path, volume_path=None):
+def analyze_hu_and_lesion_features_with_visualization(segmentation_path, volume_path=None, features=None):
     try:
-        seg_img = nib.load(segmentation_path)
-        segmentation = seg_img.get_fdata()
-
-        # Label connected components
-        labeled_segmentation, num_features = ndimage.label(segmentation > 0)
-        objects = ndimage.find_objects(labeled_segmentation)
-
-        for i, slice_tuple in enumerate(objects):
-            lesion_region = labeled_segmentation[slice_tuple] == (i + 1)
-
-            if volume_path:
-                vol_img = nib.load(volume_path)
-                volume = vol_img.get_fdata()
-                lesion_volume = volume[slice_tuple]
-                hu_values = lesion_volume[lesion_region]
-
-                lesion_mean_hu = np.mean(hu_values)
-                lesion_std_hu = np.std(hu_values)
-                lesion_min_hu = np.min(hu_values)
-                lesion_max_hu = np.max(hu_values)
-
-                # === Visualization ===
-                plt.figure(figsize=(12, 6))
-
-                # Display the middle slice with segmentation overlay
-                z_center = lesion_volume.shape[2] // 2
-                plt.subplot(1, 2, 1)
-                plt.imshow(volume[:, :, z_center], cmap='gray')
-                plt.imshow(segmentation[:, :, z_center], cmap='jet', alpha=0.5)
-                plt.title(f"Lesion {i + 1} - Mean HU: {lesion_mean_hu:.2f}")
-                plt.axis('off')
-
-                # Display the histogram of HU values
-                plt.subplot(1, 2, 2)
-                plt.hist(hu_values.flatten(), bins=50, color='blue', alpha=0.7)
-                plt.title(f"Lesion {i + 1} - HU Distribution")
-                plt.xlabel('Hounsfield Units (HU)')
-                plt.ylabel('Frequency')
-
-                # Interpretation of HU values
-                if lesion_mean_hu < 0:
-                    lesion_type = 'Cyst (Low HU)'
-                elif lesion_mean_hu < 50:
-                    lesion_type = 'Benign Tumor (Low HU)'
-                else:
-                    lesion_type = 'Malignant Tumor (High HU)'
-                plt.figtext(0.5, 0.01, f"Lesion Type: {lesion_type}", wrap=True, horizontalalignment='center', fontsize=12)
-
-                plt.tight_layout()
-                plt.show()
+        # `features` lets the prefetching main loop pass in results it has already computed
+        if features is None:
+            features = lesion_features(segmentation_path, volume_path)
+        if volume_path is None:
+            return
+
+        # Only the displayed slices are read, not the whole volume
+        slices = {}
+
+        for entry in lesion_rows(features):
+            lesion_mean_hu = entry['mean_hu']
+            # z_center is counted from the start of the lesion's bounding box
+            slice_idx = int(entry['bbox'][2, 0] + entry['z_center'])
+            if slice_idx not in slices:
+                slices[slice_idx] = (load_ct_slice(volume_path, slice_idx, cache)[0],
+                                     load_segmentation_slice(segmentation_path, slice_idx, cache)[0])
+            volume_slice, segmentation_slice = slices[slice_idx]
+
+            # === Visualization ===
+            plt.figure(figsize=(12, 6))
+
+            # Display the middle slice with segmentation overlay
+            plt.subplot(1, 2, 1)
+            plt.imshow(volume_slice, cmap='gray')
+            plt.imshow(segmentation_slice, cmap='jet', alpha=0.5)
+            plt.title(f"Lesion {entry['lesion']} - Mean HU: {lesion_mean_hu:.2f}")
+            plt.axis('off')
+
+            # Display the histogram of HU values
+            plt.subplot(1, 2, 2)
+            plot_histogram(plt.gca(), entry['hist_counts'], entry['hist_edges'], color='blue', alpha=0.7)
+            plt.title(f"Lesion {entry['lesion']} - HU Distribution")
+            plt.xlabel('Hounsfield Units (HU)')
+            plt.ylabel('Frequency')
+
+            # Interpretation of HU values
+            lesion_type = classify_lesion(lesion_mean_hu)
+            plt.figtext(0.5, 0.01, f"Lesion Type: {lesion_type}", wrap=True, horizontalalignment='center', fontsize=12)
+
+            plt.tight_layout()
+            plt.show()
 
     except Exception as e:
         print(f"Error analyzing HU and lesion features: {e}")
 
 # === Identify tumor images ===
-def identify_tumor_images(seg_files, data_folder):
-    tumor_files = []
-    for seg_file in seg_files:
-        seg_path = os.path.join(data_folder, seg_file)
-        seg_img = nib.load(seg_path)
-        segmentation = seg_img.get_fdata()
-        if 2 in np.unique(segmentation):
-            tumor_files.append(seg_file)
-    return tumor_files
+# A segmentation that already has a per-slice label index (see slice_index.py) is answered
+# from it. The others are streamed a few slices at a time and the scan stops at the first
+# tumor voxel (see tumor_scan.py); files are scanned in parallel and answers cached per file
+def identify_tumor_images(manifest, case_ids):
+    seg_paths = {case_id: case_path(manifest, case_id, 'segmentation') for case_id in case_ids}
+    found, to_scan = {}, []
+    for seg_path in seg_paths.values():
+        counts = read_slice_index(seg_path, slice_index_folder)
+        if counts is not None:
+            found[seg_path] = has_tumor(counts)
+        else:
+            to_scan.append(seg_path)
+    found.update(scan_tumor_cases(to_scan, read_workers, tumor_scan_file))
+    return [case_id for case_id in case_ids if found[seg_paths[case_id]]]
 
 # === Main loop ===
 def main():
-    tumor_files = identify_tumor_images(seg_files, data_folder)
-    print(f"Found {len(tumor_files)} segmentation files with tumors:")
-    for tumor_file in tumor_files:
-        print(tumor_file)
-
-    for seg_file in seg_files:
-        print(f"\nAnalyzing {seg_file}...")
-        segmentation_path = os.path.join(data_folder, seg_file)
-        volume_path = segmentation_path.replace('segmentation', 'volume')
-        analyze_hu_and_lesion_features_with_visualization(segmentation_path, volume_path)
+    tumor_case_ids = identify_tumor_images(manifest, seg_case_ids)
+    print(f"Found {len(tumor_case_ids)} segmentation files with tumors:")
+    for case_id in tumor_case_ids:
+        print(os.path.basename(case_path(manifest, case_id, 'segmentation')))
+
+    # Compute (or read cached) lesion features of the next cases in the background
+    def case_features(case_id):
+        try:
+            return lesion_features(case_path(manifest, case_id, 'segmentation'), case_path(manifest, case_id, 'volume'))
+        except Exception as e:
+            print(f"Error analyzing case {case_id}: {e}")
+            return None
+
+    cases = CasePrefetcher(seg_case_ids, case_features, prefetch_depth, prefetch_max_bytes, manifest_case_bytes(manifest))
+    for case_id, features in cases:
+        if features is None:
+            continue
+        segmentation_path = case_path(manifest, case_id, 'segmentation')
+        volume_path = case_path(manifest, case_id, 'volume')
+        print(f"\nAnalyzing {os.path.basename(segmentation_path)}...")
+        analyze_hu_and_lesion_features_with_visualization(segmentation_path, volume_path, features)
+
+    cases.stats.report()
 
 if __name__ == "__main__":
     main()
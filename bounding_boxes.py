@@ -0,0 +1,84 @@
+import numpy as np
+from scipy import ndimage
+
+# Bounding boxes of labeled regions without coordinate arrays.
+#
+# np.argwhere(mask) allocates an N x 3 int64 array (hundreds of MB for a large liver)
+# only to take its min and max. The helpers here never materialize coordinates:
+#   - label_bounding_boxes() gets the box of every label of an integer label map (or
+#     of every lesion of an ndimage.label result) in one pass with ndimage.find_objects
+#   - bounding_box() projects one mask, or one label of a label map, onto the axes with
+#     np.any a z-slab at a time (liver_roi's crop box); with a slice_index `counts` array
+#     only the slices that contain the label are read
+# Boxes are tuples of slices in array order (x, y, z for nibabel arrays), with stop
+# exclusive, so segmentation[box] is the cropped region. mask_codec.RLEMask.bounding_box()
+# returns the same convention straight from its runs.
+
+
+def pad_box(box, margin, shape):
+    # Grow a box by `margin` voxels on every side, clipped to the array
+    return tuple(slice(max(s.start - margin, 0), min(s.stop + margin, n)) for s, n in zip(box, shape))
+
+
+def label_bounding_boxes(labels, margin=0):
+    # {label: box} for every label > 0 present in an integer array, in one pass
+    labels = np.asarray(labels)
+    if labels.dtype == np.bool_:
+        labels = labels.view(np.uint8)
+    objects = ndimage.find_objects(labels)
+    return {i + 1: pad_box(box, margin, labels.shape) for i, box in enumerate(objects) if box is not None}
+
+
+def bounding_box(mask, label=None, margin=0, counts=None, slab=32):
+    # Box of the nonzero voxels of `mask` (or of mask == `label`), None if there are none.
+    # Pass a slice_index `counts` array to skip the axial slices without `label`.
+    z_start, z_stop = 0, mask.shape[2]
+    if counts is not None and label is not None:
+        present = np.flatnonzero(counts[:, label])
+        if present.size == 0:
+            return None
+        z_start, z_stop = int(present[0]), int(present[-1]) + 1
+
+    in_plane = np.zeros(mask.shape[:2], dtype=bool)
+    in_slices = np.zeros(mask.shape[2], dtype=bool)
+    for z0 in range(z_start, z_stop, slab):
+        z1 = min(z0 + slab, z_stop)
+        region = np.asarray(mask[:, :, z0:z1])
+        if label is not None:
+            region = region == label
+        in_plane |= region.any(axis=2)
+        in_slices[z0:z1] = region.any(axis=(0, 1))
+
+    box = []
+    for present in (in_plane.any(axis=1), in_plane.any(axis=0), in_slices):
+        index = np.flatnonzero(present)
+        if index.size == 0:
+            return None
+        box.append(slice(int(index[0]), int(index[-1]) + 1))
+    return pad_box(tuple(box), margin, mask.shape)
+
+
+# === Physical extents ===
+# Voxel boxes become millimetres through the image affine, so spacing, flips and axis
+# order are all taken into account: each box's 8 corners (voxel edges, i.e. start - 0.5
+# and stop - 0.5) are mapped to world (RAS) coordinates and the extent along each world
+# axis is their max - min. For the usual axis-aligned LiTS affines this is exactly the
+# number of voxels times the spacing along that axis.
+WORLD_AXES = ('left_right', 'posterior_anterior', 'inferior_superior')
+
+
+def box_array(boxes):
+    # Boxes as slices -> (n, 3, 2) array of [start, stop] per axis
+    return np.array([[[s.start, s.stop] for s in box] for box in boxes], dtype=np.int64).reshape(-1, 3, 2)
+
+
+def extents_mm(boxes, affine):
+    # (n, 3) extents in mm along the world axes for an (n, 3, 2) array of voxel boxes
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 3, 2)
+    upper = np.array([[i >> axis & 1 for axis in range(3)] for i in range(8)], dtype=bool)  # (8, 3) corner pattern
+    corners = np.where(upper[None], boxes[:, None, :, 1], boxes[:, None, :, 0]) - 0.5  # (n, 8, 3) voxel edges
+    world = corners @ np.asarray(affine)[:3, :3].T  # Translation cancels out in max - min
+    extents = world.max(axis=1) - world.min(axis=1)
+    empty = (boxes[:, :, 1] <= boxes[:, :, 0]).any(axis=1)
+    extents[empty] = 0.0
+    return extents
@@ -0,0 +1,130 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Prefetching case iterator that overlaps reading with analysis.
+#
+# CasePrefetcher(items, load) yields (item, load(item)) in order, while up to `depth`
+# of the following items are already being loaded on background threads. When
+# `max_bytes` is set, a new read is only started if the estimated size of every case
+# currently held (the one being processed plus those loaded ahead) stays within the
+# budget. A case counts as held until the loop asks for the case after it, since the
+# loop variable keeps it alive until then. One read ahead is always allowed so the
+# loop can make progress, so budgets below two cases are exceeded by one case.
+# After the loop, `stats` holds the time spent in each stage:
+#   read     - total time the background threads spent loading
+#   wait     - time the analysis loop stalled waiting for a case that was not ready
+#   compute  - time spent in the loop body between cases
+#   held     - number of times read-ahead was held back by the memory budget
+
+
+class PrefetchStats:
+    def __init__(self):
+        self.cases = 0
+        self.read_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.budget_holds = 0
+        self.peak_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_read(self, seconds):
+        with self._lock:
+            self.read_seconds += seconds
+
+    def report(self):
+        print(f"Prefetch: {self.cases} cases | read {self.read_seconds:.1f} s (background) | "
+              f"stalled {self.wait_seconds:.1f} s | compute {self.compute_seconds:.1f} s | "
+              f"held by budget {self.budget_holds}x | peak estimate {self.peak_bytes / 1024 ** 2:.0f} MB")
+
+
+class CasePrefetcher:
+    def __init__(self, items, load, depth=2, max_bytes=None, estimate_bytes=None):
+        self.items = list(items)
+        self.load = load
+        self.depth = max(int(depth), 0)
+        self.max_bytes = max_bytes
+        self.estimate_bytes = estimate_bytes or (lambda item: 0)
+        self.stats = PrefetchStats()
+
+    def _timed_load(self, item):
+        start = time.perf_counter()
+        try:
+            return self.load(item)
+        finally:
+            self.stats.add_read(time.perf_counter() - start)
+
+    def __iter__(self):
+        stats = self.stats
+        if self.depth == 0:
+            # No read-ahead: load synchronously (useful as a baseline)
+            for item in self.items:
+                start = time.perf_counter()
+                result = self._timed_load(item)
+                stats.wait_seconds += time.perf_counter() - start
+                stats.cases += 1
+                start = time.perf_counter()
+                yield item, result
+                stats.compute_seconds += time.perf_counter() - start
+            return
+
+        pool = ThreadPoolExecutor(max_workers=self.depth)
+        pending = deque()
+        upcoming = deque(self.items)
+        held_bytes = 0  # Estimated size of the current case plus everything loading ahead
+
+        def fill():
+            nonlocal held_bytes
+            while upcoming and len(pending) < self.depth:
+                estimate = self.estimate_bytes(upcoming[0])
+                if self.max_bytes is not None and pending and held_bytes + estimate > self.max_bytes:
+                    stats.budget_holds += 1
+                    break
+                item = upcoming.popleft()
+                held_bytes += estimate
+                stats.peak_bytes = max(stats.peak_bytes, held_bytes)
+                pending.append((item, estimate, pool.submit(self._timed_load, item)))
+
+        try:
+            fill()
+            handed = 0  # Estimate of the case the analysis loop is still holding
+            while pending:
+                item, estimate, future = pending.popleft()
+                start = time.perf_counter()
+                result = future.result()
+                future = None  # The future would otherwise keep the case alive
+                stats.wait_seconds += time.perf_counter() - start
+                stats.cases += 1
+
+                # Start the next reads before handing the case to the analysis loop
+                fill()
+                start = time.perf_counter()
+                yield item, result
+                stats.compute_seconds += time.perf_counter() - start
+
+                # The loop body only drops the previous case once it has received this one,
+                # so that one's estimate is released now and this one's on the next call
+                result = None
+                held_bytes -= handed
+                handed = estimate
+                fill()
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+
+# === Memory estimate of a volume/segmentation pair from the manifest (header only) ===
+def manifest_case_bytes(manifest, ct_itemsize=2, label_itemsize=1):
+    # lits_io returns int16 CT and uint8 labels regardless of the on-disk dtype
+    def estimate(case_id):
+        case = manifest[case_id]
+        total = 0
+        if 'volume' in case:
+            total += int(np.prod(case['volume']['shape'])) * ct_itemsize
+        if 'segmentation' in case:
+            total += int(np.prod(case['segmentation']['shape'])) * label_itemsize
+        return total
+    return estimate
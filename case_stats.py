@@ -0,0 +1,109 @@
+import numpy as np
+from hu_stats import masked_hu_stats, label_hu_stats, HUStats
+from lits_io import load_case, load_ct_slice, load_segmentation_slice, voxel_volume_ml, zooms_volume_ml
+from liver_roi import load_cropped_case
+from result_cache import cached
+from slice_index import load_slice_index, best_slice, LIVER
+
+# Per-case statistics of the labeled regions (liver = 1, tumor = 2).
+#
+# case_label_stats() computes every label of a case in one pass; region_stats() picks
+# one label from it. Everything the plotting scripts need is returned in one small dict,
+# so the result can be cached with result_cache and a re-run with unchanged inputs
+# never reloads the CT:
+#   voxels, volume_ml, mean_hu, std_hu, min_hu, max_hu  - region size and HU statistics
+#   hist_counts, hist_edges                              - HU histogram of the region
+#   slice_idx, ct_slice, seg_slice                       - display slice with the most voxels
+#                                                          of the region (see slice_index)
+
+
+def _summary(hu, label, bins, voxel_ml):
+    voxels = hu.count
+    hist_counts, hist_edges = hu.histogram(bins)
+
+    return {
+        'label': label,
+        'voxels': voxels,
+        'volume_ml': voxels * voxel_ml,
+        'mean_hu': hu.mean,
+        'std_hu': hu.std,
+        'min_hu': hu.min,
+        'max_hu': hu.max,
+        'hist_counts': hist_counts,
+        'hist_edges': hist_edges,
+    }
+
+
+def compute_region_stats(volume, segmentation, label, bins, voxel_ml):
+    # One pass over the CT and the label map (see hu_stats), no masked copy of the region
+    return _summary(masked_hu_stats(volume, segmentation, label), label, bins, voxel_ml)
+
+
+def compute_label_stats(volume, segmentation, bins, voxel_ml):
+    # Statistics of every label present, all from a single (label, HU) bincount pass
+    return {label: _summary(hu, label, bins, voxel_ml) for label, hu in label_hu_stats(volume, segmentation).items()}
+
+
+def _foreground(by_label):
+    # Background (label 0) is left out of the cached per-case results: inside a liver ROI
+    # crop it would only cover the crop's background, so it would depend on crop_folder
+    return {label: value for label, value in by_label.items() if label > 0}
+
+
+# Pass `crop_folder` to compute the statistics on a stored liver ROI crop (see liver_roi)
+# instead of the whole scan. Liver and tumor voxels all lie inside the crop, so the
+# results are identical, only faster, and both share one result-cache entry. Crops carry
+# their own per-slice label counts, so `slice_index_folder` only applies to full scans.
+@cached(paths=('volume_path', 'segmentation_path'), ignore=('cache', 'workers', 'crop_folder', 'slice_index_folder'),
+        version=3)
+def case_label_stats(volume_path, segmentation_path, bins=50, cache=None, workers=None, crop_folder=None,
+                     slice_index_folder=None):
+    # {'labels': {label: stats}, 'voxel_ml', 'slices': {label: (slice_idx, ct_slice, seg_slice)}} for one case
+    if crop_folder is not None:
+        crop = load_cropped_case(volume_path, segmentation_path, crop_folder, cache=cache, workers=workers)
+        voxel_ml = zooms_volume_ml(crop.zooms)
+        stats = {'labels': _foreground(compute_label_stats(crop.ct, crop.segmentation, bins, voxel_ml)), 'voxel_ml': voxel_ml}
+        counts = crop.slice_counts  # Stored with the crop, no second decode of the full mask
+
+        # The display slices may lie outside the crop, so read them from the source files
+        def read_slice(z):
+            return load_ct_slice(volume_path, z, cache)[0], load_segmentation_slice(segmentation_path, z, cache)[0]
+    else:
+        volume, segmentation, vol_img, seg_img = load_case(volume_path, segmentation_path, cache, workers)
+        voxel_ml = voxel_volume_ml(vol_img)
+        stats = {'labels': _foreground(compute_label_stats(volume, segmentation, bins, voxel_ml)), 'voxel_ml': voxel_ml}
+        counts = load_slice_index(segmentation_path, slice_index_folder, cache, segmentation)
+
+        def read_slice(z):
+            return np.array(volume[:, :, z]), np.array(segmentation[:, :, z])
+
+    # Display the axial slice where each label covers the most voxels
+    stats['slices'] = {}
+    for label in range(1, counts.shape[1]):
+        slice_idx = best_slice(counts, label)
+        stats['slices'][label] = (slice_idx,) + read_slice(slice_idx)
+    return stats
+
+
+# Exact per-HU histogram (hu_stats.HUStats) of every foreground label of one case. These
+# merge across cases into dataset-wide histograms and quantiles (see hu-quantiles.py).
+@cached(paths=('volume_path', 'segmentation_path'), ignore=('cache', 'workers', 'crop_folder'), version=2)
+def case_hu_stats(volume_path, segmentation_path, cache=None, workers=None, crop_folder=None):
+    if crop_folder is not None:
+        crop = load_cropped_case(volume_path, segmentation_path, crop_folder, cache=cache, workers=workers)
+        return _foreground(label_hu_stats(crop.ct, crop.segmentation))
+    volume, segmentation, vol_img, seg_img = load_case(volume_path, segmentation_path, cache, workers)
+    return _foreground(label_hu_stats(volume, segmentation))
+
+
+# Liver (1) and tumor (2) analyses of the same case share one cached case_label_stats pass
+def region_stats(volume_path, segmentation_path, label, bins=50, cache=None, workers=None, crop_folder=None):
+    case = case_label_stats(volume_path, segmentation_path, bins, cache, workers, crop_folder)
+    stats = case['labels'].get(label) or _summary(HUStats(), label, bins, case['voxel_ml'])
+    slice_idx, ct_slice, seg_slice = case['slices'].get(label, case['slices'][LIVER])
+    return dict(stats, slice_idx=slice_idx, ct_slice=ct_slice, seg_slice=seg_slice)
+
+
+# === Draw a precomputed histogram the same way plt.hist(values, bins) would ===
+def plot_histogram(ax, counts, edges, **kwargs):
+    return ax.hist(edges[:-1], bins=edges, weights=counts, **kwargs)
@@ -0,0 +1,224 @@
+import os
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from hu_stats import HU_OFFSET, N_BINS
+from sitk_reader import read_array_view, voxel_volume_ml
+from lits_io import file_fingerprint, sidecar_path, read_npz, write_npz
+
+# Streaming voxel-value census for whole datasets.
+#
+# np.unique(volume, return_counts=True) sorts every voxel of every volume, and merging
+# its output into a dict is a Python loop per distinct value. Histogram instead keeps a
+# fixed array of counts, one per integer value: the int16 HU range for CT (value +
+# 32768) or labels 0, 1, 2 for segmentations (grown if a mask holds a larger label).
+# Volumes are added a slab at a time with np.bincount, and partial histograms of
+# different files merge with one vectorized add, so a census is O(N) in the number of
+# voxels with a memory footprint of one slab plus the counts.
+#
+# run_census() can fan the files out to a process pool: every worker returns a compact
+# partial (file count, voxel count, trimmed histogram) and the parent adds them up.
+# Integer counts merge exactly in any order, so the result equals the serial run.
+# Segmentations and CT volumes are kept apart: label maps get their own census with
+# per-case background/liver/tumor voxel counts and mL, CT files the HU distribution.
+#
+# With a `store_folder`, every file's partial is also saved there under its source
+# fingerprint (size, mtime). A re-run after a new batch of cases lands only reads new or
+# changed files, deletes the partials of files that are gone, and re-merges the rest.
+
+N_LABELS = 3
+SLAB = 32  # Slices per bincount call
+
+
+class Histogram:
+    def __init__(self, offset=0, n_bins=N_LABELS):
+        self.offset = offset  # counts[i] is the number of voxels with value i - offset
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+
+    @classmethod
+    def for_hu(cls):
+        return cls(HU_OFFSET, N_BINS)
+
+    @classmethod
+    def for_labels(cls):
+        return cls(0, N_LABELS)
+
+    def _grow(self, n_bins):
+        if n_bins > self.counts.size:
+            self.counts = np.concatenate([self.counts, np.zeros(n_bins - self.counts.size, dtype=np.int64)])
+
+    def add(self, array, axis=0, slab=SLAB):
+        # Count every voxel of `array`, `slab` planes along `axis` at a time. Use axis=0
+        # for SimpleITK (z, y, x) arrays and axis=2 for nibabel (x, y, z) arrays.
+        array = np.asarray(array) if not hasattr(array, 'shape') else array
+        for start in range(0, array.shape[axis], slab):
+            values = np.asarray(np.take(array, range(start, min(start + slab, array.shape[axis])), axis=axis))
+            if np.issubdtype(values.dtype, np.floating):
+                values = np.rint(values)
+            if not (values.dtype == np.int16 or values.dtype == np.uint8):
+                if values.size and (values.min() < -self.offset or values.max() >= N_BINS - self.offset):
+                    raise ValueError(f"Values {values.min()}..{values.max()} do not fit the int16 histogram range")
+            if self.offset == 0 and values.dtype == np.uint8:
+                # Label maps: count the uint8 values directly
+                counts = np.bincount(values.ravel(), minlength=self.counts.size)
+            else:
+                counts = np.bincount(values.astype(np.int64).ravel() + self.offset)
+            self._grow(counts.size)
+            self.counts[:counts.size] += counts
+        return self
+
+    def merge(self, other):
+        # Add another histogram's counts, shifting them if its offset differs
+        start = self.offset - other.offset
+        if start < 0:
+            raise ValueError("Cannot merge a histogram with a larger offset into a smaller one")
+        nonzero = np.flatnonzero(other.counts)
+        if nonzero.size:
+            self._grow(start + int(nonzero[-1]) + 1)
+            self.counts[start:start + nonzero[-1] + 1] += other.counts[:nonzero[-1] + 1]
+        return self
+
+    def compact(self):
+        # Drop the empty bins below the smallest and above the largest value (cheap to pickle)
+        present = np.flatnonzero(self.counts)
+        if present.size == 0:
+            self.counts = self.counts[:0]
+            return self
+        self.counts = self.counts[present[0]:present[-1] + 1].copy()
+        self.offset -= int(present[0])
+        return self
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def items(self):
+        # (value, count) for every value that occurs, in increasing order
+        present = np.flatnonzero(self.counts)
+        return [(int(i) - self.offset, int(self.counts[i])) for i in present]
+
+
+# === Whole-dataset census, serial or on a process pool ===
+LABEL_NAMES = ('background', 'liver', 'tumor')
+
+
+def label_name(label):
+    return LABEL_NAMES[label] if label < len(LABEL_NAMES) else f"label {label}"
+
+
+def _is_segmentation(path):
+    return 'segmentation' in os.path.basename(path)
+
+
+def census_file(path):
+    # Partial census of one file: labels 0..2 for segmentations, the int16 HU range for CT
+    image_array, image = read_array_view(path)
+    if _is_segmentation(path):
+        histogram = Histogram.for_labels().add(image_array)
+        kind = 'labels'
+    else:
+        histogram = Histogram.for_hu().add(image_array).compact()
+        kind = 'ct'
+    return {'name': os.path.basename(path), 'kind': kind, 'files': 1, 'voxels': int(image_array.size),
+            'voxel_ml': voxel_volume_ml(image), 'histogram': histogram}
+
+
+def merge_partials(partials):
+    # {'ct': {files, voxels, histogram}, 'labels': {files, voxels, histogram, ml, cases}}
+    # where 'cases' lists (file name, label counts, label mL) per segmentation
+    total = {
+        'ct': {'files': 0, 'voxels': 0, 'histogram': Histogram.for_hu()},
+        'labels': {'files': 0, 'voxels': 0, 'histogram': Histogram.for_labels(),
+                   'ml': np.zeros(N_LABELS), 'cases': []},
+    }
+    for partial in partials:
+        part = total[partial['kind']]
+        part['files'] += partial['files']
+        part['voxels'] += partial['voxels']
+        part['histogram'].merge(partial['histogram'])
+        if partial['kind'] == 'labels':
+            counts = partial['histogram'].counts
+            ml = counts * partial['voxel_ml']
+            if ml.size > part['ml'].size:
+                part['ml'] = np.concatenate([part['ml'], np.zeros(ml.size - part['ml'].size)])
+            part['ml'][:ml.size] += ml
+            part['cases'].append((partial['name'], counts, ml))
+    total['labels']['cases'].sort(key=lambda case: case[0])
+    total['files'] = total['ct']['files'] + total['labels']['files']
+    total['voxels'] = total['ct']['voxels'] + total['labels']['voxels']
+    return total
+
+
+# === Persisted per-file partials ===
+PARTIAL_SUFFIX = '.census.npz'
+
+
+def partial_path(store_folder, path):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return sidecar_path(path, '-' + key + PARTIAL_SUFFIX, store_folder)
+
+
+def save_partial(store_folder, path, partial):
+    os.makedirs(store_folder, exist_ok=True)
+    write_npz(partial_path(store_folder, path), file_fingerprint(path),
+              name=partial['name'], kind=partial['kind'], files=partial['files'], voxels=partial['voxels'],
+              voxel_ml=partial['voxel_ml'],
+              offset=partial['histogram'].offset, counts=partial['histogram'].counts)
+
+
+def load_partial(store_folder, path):
+    # The stored partial of `path`, or None if it is missing, unreadable or the file has changed
+    data = read_npz(partial_path(store_folder, path), file_fingerprint(path))
+    if data is None:
+        return None
+    try:
+        histogram = Histogram(int(data['offset']), 0)
+        histogram.counts = data['counts']
+        return {'name': str(data['name']), 'kind': str(data['kind']), 'files': int(data['files']),
+                'voxels': int(data['voxels']), 'voxel_ml': float(data['voxel_ml']), 'histogram': histogram}
+    except KeyError:
+        return None
+
+
+def prune_partials(store_folder, paths):
+    # Delete stored partials of files that are no longer part of the census
+    keep = {os.path.basename(partial_path(store_folder, path)) for path in paths}
+    removed = 0
+    for name in os.listdir(store_folder):
+        if name.endswith(PARTIAL_SUFFIX) and name not in keep:
+            os.remove(os.path.join(store_folder, name))
+            removed += 1
+    return removed
+
+
+def run_census(paths, workers=None, store_folder=None):
+    # Census of all `paths` with `workers` processes (None or 1 runs serially in this
+    # process). Adds 'read', 'reused', 'removed', 'seconds' and 'voxels_per_second' (of
+    # the files actually read) to the merged result. Scripts calling this with
+    # workers > 1 need an `if __name__ == '__main__':` guard.
+    start = time.perf_counter()
+    partials, to_read, removed = [], list(paths), 0
+    if store_folder is not None and os.path.isdir(store_folder):
+        stored = [(path, load_partial(store_folder, path)) for path in paths]
+        partials = [partial for path, partial in stored if partial is not None]
+        to_read = [path for path, partial in stored if partial is None]
+        removed = prune_partials(store_folder, paths)
+
+    if workers and workers > 1 and len(to_read) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            new_partials = list(pool.map(census_file, to_read))
+    else:
+        new_partials = [census_file(path) for path in to_read]
+    if store_folder is not None:
+        for path, partial in zip(to_read, new_partials):
+            save_partial(store_folder, path, partial)
+
+    total = merge_partials(partials + new_partials)
+    total['read'] = len(to_read)
+    total['reused'] = len(partials)
+    total['removed'] = removed
+    total['seconds'] = time.perf_counter() - start
+    read_voxels = sum(partial['voxels'] for partial in new_partials)
+    total['voxels_per_second'] = read_voxels / total['seconds'] if total['seconds'] > 0 else float('nan')
+    return total
@@ -1,47 +1,48 @@
-import SimpleITK as sitk
 import os
-import numpy as np
+from census import run_census, label_name
 
 # Define paths for training and testing datasets
 training_dataset_path = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training_Batch1\media\nas\01_Datasets\CT\LITS\Training Batch 1'
 
+# Processes reading files in parallel (None analyzes one file at a time in this process)
+workers = 8
+
+# Folder keeping each file's partial counts; a re-run only reads new or changed files (None disables it)
+census_folder = None  # e.g. r'C:\LiTS-Census'
+
 # Function to analyze dataset
-def analyze_dataset(dataset_path):
-    class_distribution = {}
-    total_files = 0
-    total_voxels = 0
-
-    for filename in os.listdir(dataset_path):
-        if filename.endswith('.nii') or filename.endswith('.nii.gz'):  # Check for NIfTI files
-            total_files += 1
-            file_path = os.path.join(dataset_path, filename)
-            
-            # Load the image using SimpleITK
-            image = sitk.ReadImage(file_path)
-            
-            # Convert to a NumPy array
-            image_array = sitk.GetArrayFromImage(image)
-            
-            # Update total voxel count
-            total_voxels += image_array.size
-            
-            # Flatten the array to count unique intensity values
-            unique, counts = np.unique(image_array, return_counts=True)
-            
-            # Update the class distribution
-            for u, c in zip(unique, counts):
-                if u in class_distribution:
-                    class_distribution[u] += c
-                else:
-                    class_distribution[u] = c
+def analyze_dataset(dataset_path, workers=None, census_folder=None):
+    file_paths = [os.path.join(dataset_path, filename) for filename in os.listdir(dataset_path)
+                  if filename.endswith('.nii') or filename.endswith('.nii.gz')]  # Check for NIfTI files
+
+    # Every file is counted slab by slab into a fixed-size histogram (see census.py);
+    # with `workers` the files are spread over a process pool and the partial counts merged
+    census = run_census(file_paths, workers, census_folder)
 
     # Print dataset description
     print("Dataset Description:")
-    print(f"Total Files: {total_files}")
-    print(f"Total Voxels: {total_voxels}")
-    print(f"Class-wise Distribution:")
-    for intensity, count in sorted(class_distribution.items()):
+    print(f"Total Files: {census['files']}")
+    print(f"Total Voxels: {census['voxels']}")
+
+    # Segmentation files: background/liver/tumor per case and in total
+    labels = census['labels']
+    print(f"\nLabel Census ({labels['files']} segmentation files, {labels['voxels']} voxels):")
+    for name, counts, ml in labels['cases']:
+        summary = ", ".join(f"{label_name(i)} {int(c)} voxels ({v:.1f} mL)" for i, (c, v) in enumerate(zip(counts, ml)))
+        print(f"  {name}: {summary}")
+    print("  Total:")
+    for i, (count, ml) in enumerate(zip(labels['histogram'].counts, labels['ml'])):
+        print(f"    {label_name(i).capitalize()}: {int(count)} voxels ({ml:.1f} mL)")
+
+    # CT volumes: HU distribution
+    ct = census['ct']
+    print(f"\nCT Intensity Census ({ct['files']} volumes, {ct['voxels']} voxels):")
+    for intensity, count in ct['histogram'].items():
         print(f"  Intensity {intensity}: {count} voxels")
 
+    print(f"\nFiles read: {census['read']}, reused: {census['reused']}, dropped: {census['removed']}")
+    print(f"Throughput: {census['voxels_per_second'] / 1e6:.1f} M voxels/s ({census['seconds']:.1f} s, {workers or 1} worker(s))")
+
 # Analyze the training dataset
-analyze_dataset(training_dataset_path)
\ No newline at end of file
+if __name__ == '__main__':
+    analyze_dataset(training_dataset_path, workers, census_folder)
@@ -0,0 +1,75 @@
+import os
+import result_cache
+from case_stats import case_hu_stats
+from hu_stats import HUStats
+from volume_cache import VolumeCache
+from manifest import build_manifest, paired_case_ids, case_path
+from case_iterator import CasePrefetcher, manifest_case_bytes
+
+# Dataset-wide liver and tumor HU percentiles, e.g. to choose the 40/70 HU cut-offs in
+# liver_analysis.py. Each case contributes an exact per-HU histogram (hu_stats.HUStats),
+# so the whole dataset fits in a constant 512 KB per label instead of one array of
+# every masked voxel, and the percentiles equal np.percentile over all of them.
+
+# === Set path to the folder containing all volumes and segmentations ===
+data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training Dataset'
+
+# === Folder for the merged dataset histograms (liver.npz, tumor.npz); None skips saving ===
+sketch_folder = None  # e.g. r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\HU_Quantiles'
+
+# === Optional memory-mapped cache of uncompressed volumes (None disables it) ===
+cache_folder = None  # e.g. r'C:\LiTS-Cache'
+cache = VolumeCache(cache_folder) if cache_folder else None
+
+# === Optional cache of per-case analysis results (None disables it) ===
+result_cache_folder = None  # e.g. r'C:\LiTS-Results'
+result_cache.configure(result_cache_folder)
+
+# === Threads used to inflate block-indexed .nii.gz files (see recompress-dataset.py) ===
+read_workers = 8
+
+# === Optional liver ROI crops: analyze only the liver+tumor bounding box (None disables it) ===
+crop_folder = None  # e.g. r'C:\LiTS-ROI'
+
+# === Read-ahead: load the next cases in the background while the current one is analyzed ===
+prefetch_depth = 2
+prefetch_max_bytes = 4 * 1024 ** 3  # Memory budget for all cases held at once
+
+LABELS = {'liver': 1, 'tumor': 2}
+PERCENTILES = (1, 5, 50, 95, 99)
+
+
+def dataset_hu_stats(manifest, case_ids):
+    totals = {name: HUStats() for name in LABELS}
+
+    def case_stats(case_id):
+        return case_hu_stats(case_path(manifest, case_id, 'volume'), case_path(manifest, case_id, 'segmentation'),
+                             cache=cache, workers=read_workers, crop_folder=crop_folder)
+
+    cases = CasePrefetcher(case_ids, case_stats, prefetch_depth, prefetch_max_bytes, manifest_case_bytes(manifest))
+    for case_id, labels in cases:
+        for name, label in LABELS.items():
+            if label in labels:
+                totals[name].merge(labels[label])
+    cases.stats.report()
+    return totals
+
+
+def main():
+    manifest = build_manifest(data_folder)
+    totals = dataset_hu_stats(manifest, paired_case_ids(manifest))
+
+    if sketch_folder:
+        os.makedirs(sketch_folder, exist_ok=True)
+    for name, stats in totals.items():
+        quantiles = stats.quantile([p / 100 for p in PERCENTILES])
+        print(f"{name.capitalize()} HU ({stats.count} voxels):")
+        for p, value in zip(PERCENTILES, quantiles):
+            print(f"  p{p}: {value:.1f}")
+        if sketch_folder:
+            # Reload with HUStats.load() to merge with other datasets later
+            stats.save(os.path.join(sketch_folder, f"{name}.npz"))
+
+
+if __name__ == '__main__':
+    main()
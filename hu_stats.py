@@ -0,0 +1,148 @@
+import numpy as np
+
+# Single-pass HU statistics of a masked region.
+#
+# `volume[region]` materializes a copy of every masked voxel before np.mean, np.std,
+# np.min, np.max and plt.hist each walk over it again. masked_hu_stats() walks the CT
+# and the mask once, a z-slab at a time, and only accumulates an exact histogram with
+# one bin per integer HU (int16 offset by 32768). Count, mean, variance, min and max
+# are exact functions of that histogram, and HUStats.histogram() regroups it into the
+# same counts/edges np.histogram(values, bins) would return, so nothing else needs
+# the voxels. Two HUStats of different slabs, lesions or cases merge by adding counts.
+#
+# The same histogram doubles as a dataset-wide quantile sketch: at 1-HU resolution it
+# has constant size (65536 bins), merges exactly, and quantile() returns exactly what
+# np.percentile would on the concatenated voxels. save()/load() store only the
+# occupied bins.
+
+HU_OFFSET = 32768  # Maps int16 HU -32768..32767 to bin 0..65535
+N_BINS = 65536
+
+
+class HUStats:
+    def __init__(self, counts=None):
+        self.counts = np.zeros(N_BINS, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def add(self, hu_values):
+        # Accumulate a 1-D array of integer HU values
+        hu_values = np.asarray(hu_values)
+        if hu_values.size == 0:
+            return self
+        if np.issubdtype(hu_values.dtype, np.floating):
+            hu_values = np.rint(hu_values)
+        self.counts += np.bincount(hu_values.astype(np.int32) + HU_OFFSET, minlength=N_BINS)
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    # === Statistics, exact from the per-HU counts ===
+    def _present(self):
+        return np.flatnonzero(self.counts)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @property
+    def mean(self):
+        n = self.count
+        if n == 0:
+            return float('nan')
+        present = self._present()
+        return int(np.dot(self.counts[present], present - HU_OFFSET)) / n
+
+    @property
+    def var(self):
+        # Population variance (np.var / np.std default), from exact integer sums
+        n = self.count
+        if n == 0:
+            return float('nan')
+        present = self._present()
+        hu = present.astype(np.int64) - HU_OFFSET
+        weights = self.counts[present]
+        s1 = int(np.dot(weights, hu))
+        s2 = int(np.dot(weights, hu * hu))
+        return (s2 * n - s1 * s1) / (n * n)
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var))
+
+    @property
+    def min(self):
+        present = self._present()
+        return float(present[0] - HU_OFFSET) if present.size else float('nan')
+
+    @property
+    def max(self):
+        present = self._present()
+        return float(present[-1] - HU_OFFSET) if present.size else float('nan')
+
+    def quantile(self, q):
+        # np.quantile(values, q) (linear interpolation) of the original values; q in [0, 1]
+        q = np.asarray(q, dtype=np.float64)
+        n = self.count
+        if n == 0:
+            return np.full(q.shape, np.nan) if q.ndim else float('nan')
+        present = self._present()
+        cumulative = np.cumsum(self.counts[present])
+        position = (n - 1) * q
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, n - 1)
+        # The value of sorted rank r is the first HU whose cumulative count exceeds r
+        low = present[np.searchsorted(cumulative, below, side='right')] - HU_OFFSET
+        high = present[np.searchsorted(cumulative, above, side='right')] - HU_OFFSET
+        result = low + (position - below) * (high - low)
+        return float(result) if result.ndim == 0 else result
+
+    def save(self, path):
+        present = self._present()
+        np.savez(path, hu=(present - HU_OFFSET).astype(np.int16), counts=self.counts[present])
+
+    @classmethod
+    def load(cls, path):
+        stats = cls()
+        with np.load(path) as data:
+            stats.counts[data['hu'].astype(np.int64) + HU_OFFSET] = data['counts']
+        return stats
+
+    def histogram(self, bins=50):
+        # Same (counts, edges) as np.histogram(values, bins) on the original values
+        present = self._present()
+        counts, edges = np.histogram(present - HU_OFFSET, bins=bins, weights=self.counts[present])
+        return counts.astype(np.int64), edges
+
+
+def masked_hu_stats(ct, mask, label=None, slab=32, stats=None):
+    # HU statistics of the voxels where `mask` is True, or where mask == `label` when a
+    # label map is passed, reading `slab` axial slices of each at a time
+    stats = HUStats() if stats is None else stats
+    for z0 in range(0, ct.shape[2], slab):
+        mask_slab = np.asarray(mask[:, :, z0:z0 + slab])
+        if label is not None:
+            mask_slab = mask_slab == label
+        if mask_slab.any():
+            stats.add(np.asarray(ct[:, :, z0:z0 + slab])[mask_slab])
+    return stats
+
+
+# === Every label at once ===
+# One bincount over (label, HU) pairs per slab gives the exact HU histogram of every
+# label in a single pass, instead of one boolean mask and one scan per label.
+def label_hu_stats(ct, segmentation, slab=32):
+    # {label: HUStats} for every label present in `segmentation`
+    joint = np.zeros((0, N_BINS), dtype=np.int64)
+    for z0 in range(0, ct.shape[2], slab):
+        labels = np.asarray(segmentation[:, :, z0:z0 + slab]).astype(np.int64).ravel()
+        hu = np.asarray(ct[:, :, z0:z0 + slab])
+        if np.issubdtype(hu.dtype, np.floating):
+            hu = np.rint(hu)
+        n_labels = max(int(labels.max()) + 1, joint.shape[0]) if labels.size else joint.shape[0]
+        counts = np.bincount(labels * N_BINS + hu.astype(np.int64).ravel() + HU_OFFSET, minlength=n_labels * N_BINS)
+        counts = counts.reshape(n_labels, N_BINS)
+        counts[:joint.shape[0]] += joint
+        joint = counts
+    return {label: HUStats(joint[label]) for label in range(joint.shape[0]) if joint[label].any()}
+
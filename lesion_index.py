@@ -0,0 +1,95 @@
+import os
+import numpy as np
+from scipy import ndimage
+from lits_io import load_segmentation, sidecar_path, source_fields, read_json, write_json
+from bounding_boxes import label_bounding_boxes
+
+# Precomputed index of the connected lesions in each segmentation.
+#
+# HU_analysis.py used to run ndimage.label + find_objects over the whole scan on every
+# run. build_lesion_index() does that once and stores every component in a small
+# "<segmentation>.lesions.json" sidecar: component label, bounding box (start/stop per
+# axis), voxel count, centroid and one seed voxel. The sidecar is rebuilt when the
+# source file's size or mtime changes. lesion_region() later recovers a component's
+# exact mask by labeling only its bounding-box crop and keeping the part that contains
+# the seed, so the whole volume is never relabeled.
+
+INDEX_SUFFIX = '.lesions.json'
+FOREGROUND_MIN_LABEL = 1  # Components of segmentation >= 1, as HU_analysis.py labels them
+
+
+# === Building ===
+# `offset` is the position of `segmentation` inside the full volume when it is a
+# liver_roi crop; stored coordinates are always full-volume coordinates.
+def build_lesion_index(segmentation, min_label=FOREGROUND_MIN_LABEL, offset=(0, 0, 0)):
+    foreground = segmentation >= min_label
+    labeled, num_features = ndimage.label(foreground)
+    boxes = label_bounding_boxes(labeled)
+    objects = [boxes[component] for component in range(1, num_features + 1)]
+    voxel_counts = np.bincount(labeled.ravel(), minlength=num_features + 1)
+    centroids = ndimage.center_of_mass(foreground, labeled, range(1, num_features + 1)) if num_features else []
+
+    lesions = []
+    for i, slice_tuple in enumerate(objects):
+        component = i + 1
+        crop = labeled[slice_tuple] == component
+        seed = np.unravel_index(int(np.argmax(crop)), crop.shape)
+        lesions.append({
+            'label': component,
+            'bbox': [[s.start + o, s.stop + o] for s, o in zip(slice_tuple, offset)],
+            'voxels': int(voxel_counts[component]),
+            'centroid': [float(c) + o for c, o in zip(centroids[i], offset)],
+            'seed': [int(s.start + i_seed + o) for s, i_seed, o in zip(slice_tuple, seed, offset)],
+        })
+    return {'min_label': min_label, 'lesions': lesions}
+
+
+# === Sidecar files ===
+# Indexes of components >= another min_label (e.g. 2, tumor only) get their own file
+def index_path(segmentation_path, index_folder=None, min_label=FOREGROUND_MIN_LABEL):
+    suffix = INDEX_SUFFIX if min_label == FOREGROUND_MIN_LABEL else f'.min{min_label}{INDEX_SUFFIX}'
+    return sidecar_path(segmentation_path, suffix, index_folder)
+
+
+def read_lesion_index(segmentation_path, index_folder=None, min_label=FOREGROUND_MIN_LABEL):
+    # Return the stored index, or None if it is missing or stale (never builds it)
+    index = read_json(index_path(segmentation_path, index_folder, min_label), segmentation_path)
+    if index is None or index.get('min_label') != min_label or 'lesions' not in index:
+        return None
+    return index
+
+
+def load_lesion_index(segmentation_path, index_folder=None, segmentation=None, cache=None,
+                      min_label=FOREGROUND_MIN_LABEL, offset=(0, 0, 0)):
+    # Return the stored index, rebuilding it if it is missing or stale. Pass an already
+    # loaded `segmentation` (or a crop of it, with its `offset`) to avoid reading the
+    # file again when a rebuild is needed.
+    index = read_lesion_index(segmentation_path, index_folder, min_label)
+    if index is not None:
+        return index
+
+    fields = source_fields(segmentation_path)
+    if segmentation is None:
+        segmentation, _ = load_segmentation(segmentation_path, cache)
+        offset = (0, 0, 0)
+    index = build_lesion_index(segmentation, min_label, offset)
+    index.update(fields)
+
+    if index_folder:
+        os.makedirs(index_folder, exist_ok=True)
+    write_json(index_path(segmentation_path, index_folder, min_label), index)
+    return index
+
+
+# === Jumping straight to a lesion ===
+# Pass the crop's `offset` when indexing into a liver_roi crop instead of the full volume.
+def lesion_slices(lesion, offset=(0, 0, 0)):
+    return tuple(slice(start - o, stop - o) for (start, stop), o in zip(lesion['bbox'], offset))
+
+
+def lesion_region(lesion, segmentation, min_label=FOREGROUND_MIN_LABEL, offset=(0, 0, 0)):
+    # Boolean mask of the lesion inside its bounding box (same shape as the crop)
+    slice_tuple = lesion_slices(lesion, offset)
+    labeled, _ = ndimage.label(segmentation[slice_tuple] >= min_label)
+    seed = tuple(s - start for s, (start, _) in zip(lesion['seed'], lesion['bbox']))
+    return labeled == labeled[seed]
@@ -0,0 +1,90 @@
+import numpy as np
+from scipy import ndimage
+from bounding_boxes import extents_mm
+from lesion_index import lesion_slices, lesion_region, FOREGROUND_MIN_LABEL
+
+# Per-lesion statistics for every lesion of a case at once.
+#
+# The lesions come from the precomputed lesion index (see lesion_index.py), which is
+# also the source of their numbering, bounding boxes and voxel counts. Each lesion's
+# exact mask is recovered by relabeling only its bounding-box crop (lesion_index's
+# lesion_region), and the HU values of all lesions are then reduced together: each
+# statistic is a single labeled reduction (np.bincount, ndimage.minimum/maximum), instead
+# of one set of reductions per lesion in a Python loop. The result is a columnar table:
+# a dict of arrays with one row per lesion, in lesion index order.
+#
+#   lesion                      - component label from the lesion index
+#   bbox                        - (n, 3, 2) start/stop per axis, in full-volume coordinates
+#   voxels, volume_ml           - lesion size
+#   extent_mm                   - (n, 3) size along the world axes, when the affine is given
+#   mean_hu, std_hu, min_hu, max_hu, hist_counts (n, bins), hist_edges (n, bins + 1)
+#                               - HU statistics, only when a CT volume is given
+
+
+def _histograms(hu, labels, min_hu, max_hu, bins):
+    # Each lesion's np.histogram(values, bins) over its own [min, max], for all lesions at once
+    lo, hi = min_hu.astype(np.float64), max_hu.astype(np.float64)
+    flat = lo == hi
+    lo[flat] -= 0.5  # np.histogram widens an empty range the same way
+    hi[flat] += 0.5
+    edges = np.linspace(lo, hi, bins + 1, axis=1)  # Row by row the same edges np.histogram builds
+
+    rows = labels - 1
+    index = ((hu - lo[rows]) * (bins / (hi - lo))[rows]).astype(np.int64)
+    index = np.clip(index, 0, bins - 1)
+    # Fix rounding at the bin edges exactly as np.histogram does
+    index[hu < edges[rows, index]] -= 1
+    index[(hu >= edges[rows, index + 1]) & (index != bins - 1)] += 1
+    counts = np.bincount(rows * bins + index, minlength=len(lo) * bins).reshape(len(lo), bins)
+    return counts, edges
+
+
+def lesion_table(lesions, segmentation=None, volume=None, voxel_ml=None, bins=50, min_label=FOREGROUND_MIN_LABEL,
+                 offset=(0, 0, 0), affine=None):
+    # `lesions` is load_lesion_index(...)['lesions'] for the same `min_label`. Returns the
+    # table and each lesion's mask inside its bounding box (None without a segmentation).
+    # `offset` is the position of `segmentation`/`volume` inside the full volume when
+    # they are a liver_roi crop; bounding boxes are always full-volume coordinates
+    n = len(lesions)
+    table = {
+        'lesion': np.array([lesion['label'] for lesion in lesions], dtype=np.int64),
+        'bbox': np.array([lesion['bbox'] for lesion in lesions], dtype=np.int64).reshape(n, 3, 2),
+        'voxels': np.array([lesion['voxels'] for lesion in lesions], dtype=np.int64),
+    }
+    if voxel_ml is not None:
+        table['volume_ml'] = table['voxels'] * voxel_ml
+    if affine is not None:
+        table['extent_mm'] = extents_mm(table['bbox'], affine)
+    if segmentation is None:
+        return table, None
+
+    regions = [lesion_region(lesion, segmentation, min_label, offset) for lesion in lesions]
+
+    if volume is not None:
+        # HU values of every lesion, each tagged with its row + 1, for the labeled reductions
+        parts = [np.asarray(volume[lesion_slices(lesion, offset)])[region] for lesion, region in zip(lesions, regions)]
+        hu = np.concatenate(parts).astype(np.float64) if n else np.zeros(0)
+        labels = np.repeat(np.arange(1, n + 1), [part.size for part in parts])
+        voxels = np.maximum(table['voxels'], 1)
+        mean = np.bincount(labels, weights=hu, minlength=n + 1)[1:] / voxels
+        # Variance around each lesion's own mean (population, like np.std)
+        var = np.bincount(labels, weights=(hu - mean[labels - 1]) ** 2, minlength=n + 1)[1:] / voxels
+        index = np.arange(1, n + 1)
+        min_hu = np.asarray(ndimage.minimum(hu, labels, index) if n else [], dtype=np.float64)
+        max_hu = np.asarray(ndimage.maximum(hu, labels, index) if n else [], dtype=np.float64)
+        hist_counts, hist_edges = _histograms(hu, labels, min_hu, max_hu, bins)
+        table.update({
+            'mean_hu': mean,
+            'std_hu': np.sqrt(var),
+            'min_hu': min_hu,
+            'max_hu': max_hu,
+            'hist_counts': hist_counts,
+            'hist_edges': hist_edges,
+        })
+    return table, regions
+
+
+def lesion_rows(table):
+    # Iterate over the table one lesion (dict of scalars/arrays) at a time
+    for i in range(len(table['lesion'])):
+        yield {key: column[i] for key, column in table.items()}
@@ -0,0 +1,240 @@
+import os
+import json
+import zipfile
+import threading
+import contextlib
+import nibabel as nib
+import numpy as np
+import parallel_gzip
+
+# Shared loaders for LiTS volumes and segmentations.
+#
+# nib.load(...).get_fdata() turns every int16 CT volume and every uint8 label map
+# into float64, which is 4-8x the memory actually needed. These helpers keep the
+# native integer dtypes instead:
+#   - CT volumes come back as int16 Hounsfield units (slope/intercept applied)
+#   - segmentations come back as uint8 labels (0 = background, 1 = liver, 2 = tumor)
+# Every loader returns the array together with the nibabel image, so scripts can
+# still read header information such as img.header.get_zooms().
+
+HU_MIN = np.iinfo(np.int16).min
+HU_MAX = np.iinfo(np.int16).max
+
+
+# === Scaling helpers ===
+def scaling(img):
+    # (slope, intercept) of a nibabel image, read from the header only
+    # nibabel stores NaN when no scaling is set; treat that as slope 1 / intercept 0
+    slope = getattr(img.dataobj, 'slope', 1.0)
+    inter = getattr(img.dataobj, 'inter', 0.0)
+    slope = 1.0 if slope is None or np.isnan(slope) else float(slope)
+    inter = 0.0 if inter is None or np.isnan(inter) else float(inter)
+    return slope, inter
+
+
+def _unscaled_data(img):
+    # Read the raw on-disk values without nibabel's float conversion
+    if hasattr(img.dataobj, 'get_unscaled'):
+        return np.asanyarray(img.dataobj.get_unscaled())
+    return np.asanyarray(img.dataobj)
+
+
+def to_hu(raw, slope=1.0, inter=0.0):
+    # Apply slope/intercept and return int16 HU without going through float64
+    if raw.dtype == np.int16 and slope == 1.0 and inter == 0.0:
+        return raw
+    if np.issubdtype(raw.dtype, np.integer) and float(slope).is_integer() and float(inter).is_integer():
+        hu = raw.astype(np.int32)
+        if slope != 1.0:
+            hu *= int(slope)
+        if inter != 0.0:
+            hu += int(inter)
+    else:
+        hu = raw.astype(np.float32)
+        if slope != 1.0:
+            hu *= np.float32(slope)
+        if inter != 0.0:
+            hu += np.float32(inter)
+        np.rint(hu, out=hu)
+    np.clip(hu, HU_MIN, HU_MAX, out=hu)
+    return hu.astype(np.int16)
+
+
+def to_labels(raw, slope=1.0, inter=0.0):
+    # Segmentations only hold small non-negative integers; store them as uint8
+    if raw.dtype == np.uint8 and slope == 1.0 and inter == 0.0:
+        return raw
+    if slope != 1.0 or inter != 0.0:
+        raw = raw * slope + inter
+    if np.issubdtype(raw.dtype, np.floating):
+        raw = np.rint(raw)
+    return raw.astype(np.uint8)
+
+
+# === File fingerprint (size and modification time) used to invalidate caches ===
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# === Sidecar files derived from a source file (indexes, crops, caches) ===
+# A sidecar is named after its source without the .nii/.nii.gz suffix, stored next to it
+# or in a separate folder, and written atomically: to a temporary file first, then moved
+# into place, so an interrupted run never leaves a partial file behind. Sidecars that
+# are missing, unreadable or whose stored fingerprint differs count as stale.
+NIFTI_SUFFIXES = ('.nii.gz', '.nii')
+
+
+def strip_nifti_suffix(name):
+    for ext in NIFTI_SUFFIXES:
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+
+def sidecar_path(source_path, suffix, folder=None):
+    # "<source name><suffix>" in `folder`, or next to the source file
+    name = strip_nifti_suffix(os.path.basename(source_path)) + suffix
+    return os.path.join(folder or os.path.dirname(source_path), name)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    # Open a temporary file next to `path` (unique per process and thread) for writing
+    # and move it over `path` once the block completes
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(path, obj, **kwargs):
+    with atomic_write(path, 'w') as f:
+        json.dump(obj, f, **kwargs)
+
+
+def write_npz(path, fingerprint=None, **arrays):
+    # Store `arrays` (and the source `fingerprint`, if given) in an .npz file
+    if fingerprint is not None:
+        arrays['fingerprint'] = np.asarray(fingerprint, dtype=np.int64)
+    with atomic_write(path) as f:
+        np.savez(f, **arrays)
+
+
+def read_npz(path, fingerprint=None):
+    # {name: array} of an .npz file written by write_npz, or None if it is missing,
+    # unreadable, or stored a fingerprint other than `fingerprint`
+    try:
+        with np.load(path) as data:
+            if fingerprint is not None and not np.array_equal(data['fingerprint'], np.asarray(fingerprint)):
+                return None
+            return {name: data[name] for name in data.files}
+    except (zipfile.BadZipFile, EOFError, OSError, KeyError, ValueError):
+        return None
+
+
+def source_fields(source_path):
+    # Fingerprint of the source file as stored in JSON sidecars
+    size, mtime_ns = file_fingerprint(source_path)
+    return {'source_size': size, 'source_mtime_ns': mtime_ns}
+
+
+def read_json(path, source_path=None):
+    # Parsed JSON file, or None if it is missing or unreadable, or (with `source_path`)
+    # its source_fields() no longer match that file
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if source_path is not None:
+        fields = source_fields(source_path)
+        if not isinstance(data, dict) or any(data.get(key) != value for key, value in fields.items()):
+            return None
+    return data
+
+
+# === Loaders ===
+# Pass a volume_cache.VolumeCache as `cache` to reuse uncompressed memory-mapped copies
+# of .nii.gz inputs instead of decompressing them on every run.
+# Pass `workers` to inflate block-indexed .nii.gz files (see parallel_gzip.recompress)
+# on several threads; files without a block index are read by nibabel as usual.
+def _read_unscaled(img, workers=None):
+    path = img.get_filename()
+    if workers and path and path.endswith('.gz'):
+        parallel = parallel_gzip.read_unscaled(path, workers)
+        if parallel is not None:
+            return parallel
+    slope, inter = scaling(img)
+    return _unscaled_data(img), slope, inter
+
+
+def _read_ct(img, workers=None):
+    return to_hu(*_read_unscaled(img, workers))
+
+
+def _read_labels(img, workers=None):
+    return to_labels(*_read_unscaled(img, workers))
+
+
+def load_ct(path, cache=None, workers=None):
+    img = nib.load(path)  # Only the header is read here; the data is decoded lazily
+    if cache is not None:
+        return cache.get(path, 'ct', lambda: _read_ct(img, workers)), img
+    return _read_ct(img, workers), img
+
+
+def load_segmentation(path, cache=None, workers=None):
+    img = nib.load(path)
+    if cache is not None:
+        return cache.get(path, 'seg', lambda: _read_labels(img, workers)), img
+    return _read_labels(img, workers), img
+
+
+def load_case(volume_path, segmentation_path, cache=None, workers=None):
+    volume, vol_img = load_ct(volume_path, cache, workers)
+    segmentation, seg_img = load_segmentation(segmentation_path, cache, workers)
+    return volume, segmentation, vol_img, seg_img
+
+
+# === Single-slice previews ===
+# Only the requested axial slice is read: from the memmap cache when an entry already
+# exists, otherwise through nibabel's dataobj array proxy, so the full 3D array is
+# never decoded into memory. slice_idx defaults to the middle slice.
+def _load_slice(path, kind, convert, slice_idx, cache):
+    img = nib.load(path)
+    if slice_idx is None:
+        slice_idx = img.shape[2] // 2
+    if cache is not None:
+        cached = cache.lookup(path, kind)
+        if cached is not None:
+            return np.array(cached[:, :, slice_idx]), img
+    return convert(np.asanyarray(img.dataobj[:, :, slice_idx])), img
+
+
+def load_ct_slice(path, slice_idx=None, cache=None):
+    return _load_slice(path, 'ct', to_hu, slice_idx, cache)
+
+
+def load_segmentation_slice(path, slice_idx=None, cache=None):
+    return _load_slice(path, 'seg', to_labels, slice_idx, cache)
+
+
+def load_slice(path, slice_idx=None, cache=None):
+    # For folders that mix volumes and segmentations, pick the loader from the file name
+    if 'segmentation' in os.path.basename(path):
+        return load_segmentation_slice(path, slice_idx, cache)
+    return load_ct_slice(path, slice_idx, cache)
+
+
+def zooms_volume_ml(zooms):
+    # Voxel size in mm³ converted to mL, in float64 so header zooms and stored copies agree
+    return float(np.prod(np.asarray(zooms[:3], dtype=np.float64))) / 1000
+
+
+def voxel_volume_ml(img):
+    return zooms_volume_ml(img.header.get_zooms())
@@ -1,76 +1,174 @@
 import os
-import nibabel as nib
+import csv
+import time
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+from concurrent.futures import ThreadPoolExecutor
+from bounding_boxes import box_array, extents_mm, WORLD_AXES
+from lesion_index import read_lesion_index, load_lesion_index
+from lesion_stats import lesion_table, lesion_rows
+from manifest import build_manifest, case_ids_with, case_path
+from mask_codec import load_or_encode
+from slice_index import best_slice
+
+try:
+    import pandas as pd  # Optional: only needed to write a Parquet report
+except ImportError:
+    pd = None
 
 # === Set path to the folder containing all segmentations ===
 data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training Dataset'
 
-# === List all segmentation files ===
-segmentation_files = sorted([f for f in os.listdir(data_folder) if 'segmentation' in f and (f.endswith('.nii') or f.endswith('.nii.gz'))])
-
-# === Function to analyze liver size from segmentation files ===
-def analyze_liver_from_segmentations(segmentation_files, data_folder):
-    for i, seg_file in enumerate(segmentation_files):
-        seg_path = os.path.join(data_folder, seg_file)
-
-        # Load the segmentation file
-        seg_img = nib.load(seg_path)
-        segmentation = seg_img.get_fdata()
-
-        # Extract voxel size from the header
-        voxel_size = np.prod(seg_img.header.get_zooms())  # Voxel size in mm³
-
-        # Extract the liver region (assuming label 1 corresponds to the liver)
-        liver_region = segmentation == 1
-
-        # Calculate liver volume
-        liver_volume = np.sum(liver_region) * voxel_size / 1000  # Convert to mL
-
-        # Calculate liver height and width from the segmented region
-        liver_coords = np.argwhere(liver_region)
-        if liver_coords.size > 0:
-            min_row, max_row = liver_coords[:, 0].min(), liver_coords[:, 0].max()
-            min_col, max_col = liver_coords[:, 1].min(), liver_coords[:, 1].max()
-
-            # Liver height and width in pixels
-            liver_height = max_row - min_row + 1  # Add 1 to include both endpoints
-            liver_width = max_col - min_col + 1  # Add 1 to include both endpoints
-        else:
-            liver_height = 0
-            liver_width = 0
-
-        # Display the results visually
-        plt.figure(figsize=(10, 6))
-        plt.imshow(segmentation[:, :, segmentation.shape[2] // 2] == 1, cmap='jet')
-
-        # Add bounding box and lines for height and width
-        if liver_coords.size > 0:
-            # Draw the bounding box
-            rect = Rectangle((min_col, min_row), liver_width, liver_height,
-                             linewidth=2, edgecolor='yellow', facecolor='none')
-            plt.gca().add_patch(rect)
-
-            # Add height and width lines
-            plt.plot([min_col, max_col], [min_row, min_row], color='cyan', linestyle='--', linewidth=2, label='Width')
-            plt.plot([min_col, min_col], [min_row, max_row], color='magenta', linestyle='--', linewidth=2, label='Height')
-
-            # Annotate the height and width
-            plt.annotate(f"Height: {liver_height} px", xy=(min_col, (min_row + max_row) // 2),
-                         xytext=(min_col - 50, (min_row + max_row) // 2),
-                         arrowprops=dict(facecolor='green', shrink=0.05),
-                         fontsize=10, color='white')
-            plt.annotate(f"Width: {liver_width} px", xy=((min_col + max_col) // 2, min_row),
-                         xytext=((min_col + max_col) // 2, min_row - 20),
-                         arrowprops=dict(facecolor='green', shrink=0.05),
-                         fontsize=10, color='white')
-
-        # Add title with liver size information
-        plt.title(f"Segmentation: {seg_file}\nLiver Volume: {liver_volume:.2f} mL\n"
-                  f"Liver Height: {liver_height} px, Liver Width: {liver_width} px")
-        plt.axis('off')
-        plt.show()
+# === Report with one row per segmentation (.csv, or .parquet when pandas is installed) ===
+report_path = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Liver_Size.csv'
+
+# === Report with one row per tumor lesion, same format ===
+lesion_report_path = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Lesion_Size.csv'
+
+# === Folder for the run-length mask sidecars (None stores them next to each segmentation) ===
+rle_folder = None
+
+# === Folder for the tumor lesion index sidecars (None stores them next to each segmentation) ===
+lesion_index_folder = None
+
+# === Threads measuring cases in parallel ===
+workers = 8
+
+# === Show one figure per case (slow; off for batch runs) ===
+plot = False
+
+# === Liver and lesion size of one segmentation: volume, voxel count and extents ===
+# Extents are given in voxels along the array axes and in mm along the world axes
+# (left-right, posterior-anterior, inferior-superior) using the affine orientation.
+def measure_liver(case_id, seg_path):
+    # Run-length encoded labels (see mask_codec.py), stored once per file: the liver voxel
+    # count and bounding box come straight from the runs without decoding the mask
+    mask = load_or_encode(seg_path, rle_folder)
+
+    # Extract voxel size from the header
+    zooms = [float(zoom) for zoom in mask.zooms]
+    voxel_size = float(np.prod(zooms))  # Voxel size in mm³
+
+    label_counts = mask.label_counts()
+    liver_voxels = int(label_counts[1])  # Assuming label 1 corresponds to the liver
+
+    # Liver extents in voxels and along the world axes
+    bounds = mask.bounding_box(1)
+    if bounds is None:
+        bounds = tuple(slice(0, 0) for _ in range(3))
+    affine = mask.affine
+    liver_mm = extents_mm(box_array([bounds]), affine)[0]
+
+    # Every tumor component (see lesion_index.py and lesion_stats.py), with its extents in mm.
+    # Only cases with tumor and no up-to-date tumor lesion index decode their mask
+    lesions = []
+    if label_counts[2:].any():
+        index = (read_lesion_index(seg_path, lesion_index_folder, min_label=2)
+                 or load_lesion_index(seg_path, lesion_index_folder, mask.decode(), min_label=2))
+        table, _ = lesion_table(index['lesions'], voxel_ml=voxel_size / 1000, min_label=2, affine=affine)
+        lesions = [{
+            'case_id': case_id,
+            'file': os.path.basename(seg_path),
+            'lesion': int(lesion['lesion']),
+            'voxels': int(lesion['voxels']),
+            'volume_ml': float(lesion['volume_ml']),
+            **{f'extent_{axis}_mm': float(extent) for axis, extent in zip(WORLD_AXES, lesion['extent_mm'])},
+        } for lesion in lesion_rows(table)]
+
+    row = {
+        'case_id': case_id,
+        'file': os.path.basename(seg_path),
+        'liver_voxels': liver_voxels,
+        'liver_volume_ml': liver_voxels * voxel_size / 1000,  # Convert to mL
+        'liver_height_px': bounds[0].stop - bounds[0].start,
+        'liver_width_px': bounds[1].stop - bounds[1].start,
+        'liver_slices': bounds[2].stop - bounds[2].start,
+        'x_min': bounds[0].start, 'x_max': bounds[0].stop - 1,
+        'y_min': bounds[1].start, 'y_max': bounds[1].stop - 1,
+        'z_min': bounds[2].start, 'z_max': bounds[2].stop - 1,
+        **{f'liver_extent_{axis}_mm': float(extent) for axis, extent in zip(WORLD_AXES, liver_mm)},
+        'lesions': len(lesions),
+        'lesion_volume_ml': float(sum(lesion['volume_ml'] for lesion in lesions)),
+        'voxel_x_mm': float(zooms[0]), 'voxel_y_mm': float(zooms[1]), 'voxel_z_mm': float(zooms[2]),
+    }
+    return row, lesions
+
+# === Measure every segmentation in parallel: (liver rows, lesion rows) ===
+def analyze_liver_from_segmentations(manifest, case_ids, workers=None):
+    with ThreadPoolExecutor(max_workers=workers or 1) as pool:
+        results = list(pool.map(lambda case_id: measure_liver(case_id, case_path(manifest, case_id, 'segmentation')),
+                                case_ids))
+    return [row for row, _ in results], [lesion for _, lesions in results for lesion in lesions]
+
+# === Write the report ===
+def write_report(rows, report_path):
+    if report_path.endswith('.parquet'):
+        if pd is None:
+            raise ImportError("Writing a Parquet report requires pandas (and pyarrow); use a .csv path instead")
+        pd.DataFrame(rows).to_parquet(report_path, index=False)
+        return
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ['case_id'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+# === Display the results visually for one case ===
+def plot_liver(manifest, row):
+    # Imported here so that batch runs without plotting never load matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+
+    seg_path = case_path(manifest, row['case_id'], 'segmentation')
+    liver_height, liver_width = row['liver_height_px'], row['liver_width_px']
+    min_row, max_row, min_col, max_col = row['x_min'], row['x_max'], row['y_min'], row['y_max']
+
+    # Show the axial slice with the most liver, decoded from the stored runs
+    mask = load_or_encode(seg_path, rle_folder)
+    seg_slice = mask.decode_slice(best_slice(mask.slice_counts()))
+    plt.figure(figsize=(10, 6))
+    plt.imshow(seg_slice == 1, cmap='jet')
+
+    # Add bounding box and lines for height and width
+    if row['liver_voxels'] > 0:
+        # Draw the bounding box
+        rect = Rectangle((min_col, min_row), liver_width, liver_height,
+                         linewidth=2, edgecolor='yellow', facecolor='none')
+        plt.gca().add_patch(rect)
+
+        # Add height and width lines
+        plt.plot([min_col, max_col], [min_row, min_row], color='cyan', linestyle='--', linewidth=2, label='Width')
+        plt.plot([min_col, min_col], [min_row, max_row], color='magenta', linestyle='--', linewidth=2, label='Height')
+
+        # Annotate the height and width
+        plt.annotate(f"Height: {liver_height} px", xy=(min_col, (min_row + max_row) // 2),
+                     xytext=(min_col - 50, (min_row + max_row) // 2),
+                     arrowprops=dict(facecolor='green', shrink=0.05),
+                     fontsize=10, color='white')
+        plt.annotate(f"Width: {liver_width} px", xy=((min_col + max_col) // 2, min_row),
+                     xytext=((min_col + max_col) // 2, min_row - 20),
+                     arrowprops=dict(facecolor='green', shrink=0.05),
+                     fontsize=10, color='white')
+
+    # Add title with liver size information
+    plt.title(f"Segmentation: {row['file']}\nLiver Volume: {row['liver_volume_ml']:.2f} mL\n"
+              f"Liver Height: {liver_height} px, Liver Width: {liver_width} px\n"
+              f"Extent (L-R x P-A x I-S): {row['liver_extent_left_right_mm']:.0f} x "
+              f"{row['liver_extent_posterior_anterior_mm']:.0f} x {row['liver_extent_inferior_superior_mm']:.0f} mm")
+    plt.axis('off')
+    plt.show()
 
 # === Run the analysis ===
-analyze_liver_from_segmentations(segmentation_files, data_folder)
\ No newline at end of file
+if __name__ == '__main__':
+    # Look up segmentation files by case ID (header-only manifest)
+    manifest = build_manifest(data_folder)
+    case_ids = case_ids_with(manifest, 'segmentation')
+
+    start = time.perf_counter()
+    rows, lesions = analyze_liver_from_segmentations(manifest, case_ids, workers)
+    write_report(rows, report_path)
+    write_report(lesions, lesion_report_path)
+    print(f"Measured {len(rows)} segmentations and {len(lesions)} lesions in {time.perf_counter() - start:.1f} s")
+    print(f"Reports saved to: {report_path} and {lesion_report_path}")
+
+    if plot:
+        for row in rows:
+            plot_liver(manifest, row)
@@ -1,8 +1,11 @@
 import os
-import nibabel as nib
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
+import result_cache
+from case_stats import region_stats, plot_histogram
+from volume_cache import VolumeCache
+from manifest import build_manifest, paired_case_ids, case_path
+from case_iterator import CasePrefetcher, manifest_case_bytes
 
 # === Set path to the folder containing all volumes and segmentations ===
 data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training Dataset'
@@ -11,37 +14,45 @@ data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Proje
 output_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Liver_Analysis'
 os.makedirs(output_folder, exist_ok=True)  # Create the folder if it doesn't exist
 
-# === List all volume and segmentation files ===
-volume_files = sorted([f for f in os.listdir(data_folder) if 'volume' in f and (f.endswith('.nii') or f.endswith('.nii.gz'))])
-segmentation_files = sorted([f for f in os.listdir(data_folder) if 'segmentation' in f and (f.endswith('.nii') or f.endswith('.nii.gz'))])
+# === Optional memory-mapped cache of uncompressed volumes (None disables it) ===
+cache_folder = None  # e.g. r'C:\LiTS-Cache'
+cache = VolumeCache(cache_folder) if cache_folder else None
 
-# === Match volume and segmentation files ===
-if len(volume_files) != len(segmentation_files):
-    raise ValueError("Mismatch in the number of volume and segmentation files!")
+# === Optional cache of per-case analysis results (None disables it) ===
+result_cache_folder = None  # e.g. r'C:\LiTS-Results'
+result_cache.configure(result_cache_folder)
 
-# === Function to analyze liver size and HU values ===
-def analyze_liver(volume_files, seg_files, data_folder, output_folder):
-    for i in range(len(volume_files)):
-        vol_file = os.path.join(data_folder, volume_files[i])
-        seg_file = os.path.join(data_folder, seg_files[i])
+# === Threads used to inflate block-indexed .nii.gz files (see recompress-dataset.py) ===
+read_workers = 8
 
-        vol_img = nib.load(vol_file)
-        seg_img = nib.load(seg_file)
+# === Optional liver ROI crops: analyze only the liver+tumor bounding box (None disables it) ===
+crop_folder = None  # e.g. r'C:\LiTS-ROI'
 
-        volume = vol_img.get_fdata()
-        segmentation = seg_img.get_fdata()
+# === Read-ahead: load the next cases in the background while the current one is analyzed ===
+prefetch_depth = 2
+prefetch_max_bytes = 4 * 1024 ** 3  # Memory budget for all cases held at once
 
-        # Extract the liver region (assuming label 1 corresponds to the liver)
-        liver_region = segmentation == 1
-        liver_hu_values = volume[liver_region]
+# === Look up volume and segmentation files by case ID (header-only manifest) ===
+manifest = build_manifest(data_folder)
+case_ids = paired_case_ids(manifest)
 
-        # Calculate liver size
-        voxel_size = np.prod(vol_img.header.get_zooms())  # Voxel size in mm³
-        liver_volume = np.sum(liver_region) * voxel_size / 1000  # Convert to mL
+# === Match volume and segmentation files ===
+if len(case_ids) != len(manifest):
+    raise ValueError("Mismatch in the number of volume and segmentation files!")
 
-        # Calculate HU statistics
-        mean_hu = np.mean(liver_hu_values)
-        std_hu = np.std(liver_hu_values)
+# === Function to analyze liver size and HU values ===
+def analyze_liver(manifest, case_ids, output_folder):
+    # Liver statistics (label 1) are computed in the background, or read from the result cache
+    def liver_stats(case_id):
+        return region_stats(case_path(manifest, case_id, 'volume'), case_path(manifest, case_id, 'segmentation'), 1,
+                            cache=cache, workers=read_workers, crop_folder=crop_folder)
+
+    cases = CasePrefetcher(case_ids, liver_stats, prefetch_depth, prefetch_max_bytes, manifest_case_bytes(manifest))
+    for case_id, stats in cases:
+        # Liver size (mL) and HU statistics
+        liver_volume = stats['volume_ml']
+        mean_hu = stats['mean_hu']
+        std_hu = stats['std_hu']
 
         # Determine if the liver is normal or abnormal based on size
         liver_status = "Normal" if 1200 <= liver_volume <= 1600 else "Abnormal"
@@ -54,22 +65,23 @@ def analyze_liver(volume_files, seg_files, data_folder, output_folder):
         else:
             diagnosis = "Iron Overload or Fibrosis (High HU)"
 
-        # Choose the middle slice for visualization
-        slice_idx = volume.shape[2] // 2
+        # Slice with the most liver for visualization (see case_stats)
+        volume_slice = stats['ct_slice']
+        segmentation_slice = stats['seg_slice']
 
         # === Visualization ===
         plt.figure(figsize=(18, 6))
 
         # Panel 1: Segmented Liver Photo
         plt.subplot(1, 4, 1)
-        plt.imshow(segmentation[:, :, slice_idx] == 1, cmap='jet')
+        plt.imshow(segmentation_slice == 1, cmap='jet')
         plt.title("Segmented Liver")
         plt.axis('off')
 
         # Panel 2: Merged Photo with Liver Overlay
         plt.subplot(1, 4, 2)
-        plt.imshow(volume[:, :, slice_idx], cmap='gray')
-        plt.imshow(segmentation[:, :, slice_idx] == 1, cmap='jet', alpha=0.5)
+        plt.imshow(volume_slice, cmap='gray')
+        plt.imshow(segmentation_slice == 1, cmap='jet', alpha=0.5)
         plt.title(f"CT Slice with Liver Overlay\nLiver Status: {liver_status}")
         plt.axis('off')
 
@@ -80,7 +92,7 @@ def analyze_liver(volume_files, seg_files, data_folder, output_folder):
 
         # Panel 4: Histogram of HU Values with Diagnosis
         plt.subplot(1, 4, 4)
-        plt.hist(liver_hu_values, bins=50, color='blue', alpha=0.7)
+        plot_histogram(plt.gca(), stats['hist_counts'], stats['hist_edges'], color='blue', alpha=0.7)
         plt.title(f"HU Distribution\nMean HU: {mean_hu:.2f}\nDiagnosis: {diagnosis}")
         plt.xlabel("Hounsfield Units (HU)")
         plt.ylabel("Frequency")
@@ -90,11 +102,13 @@ def analyze_liver(volume_files, seg_files, data_folder, output_folder):
         plt.show()
 
         # Save the output image
-        output_file = os.path.join(output_folder, f'Liver_Analysis-{i}.png')
+        output_file = os.path.join(output_folder, f'Liver_Analysis-{case_id}.png')
         plt.savefig(output_file, dpi=300)
         plt.close()
 
         print(f"Liver analysis saved to: {output_file}")
 
+    cases.stats.report()
+
 # === Run the analysis ===
-analyze_liver(volume_files, segmentation_files, data_folder, output_folder)
\ No newline at end of file
+analyze_liver(manifest, case_ids, output_folder)
\ No newline at end of file
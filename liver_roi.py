@@ -0,0 +1,83 @@
+import os
+import hashlib
+import numpy as np
+from lits_io import load_case, file_fingerprint, sidecar_path, read_npz, write_npz
+from bounding_boxes import bounding_box
+from slice_index import build_slice_index
+
+# Liver region-of-interest crops.
+#
+# The liver is usually 5-15% of a LiTS volume, but every statistic, histogram and
+# texture pass only looks at liver and tumor voxels. crop_case() cuts the CT and the
+# segmentation down to the liver+tumor bounding box (plus `margin` voxels on each side)
+# and remembers where the crop sits in the full volume. load_cropped_case() stores the
+# crops in a folder so later runs read a few MB instead of the whole scan; a stored
+# crop is rebuilt when either source file or the margin changes. Stored crops also keep
+# the full volume's per-slice label counts (see slice_index.py), taken while the whole
+# segmentation is in memory, so display slices can be chosen without decoding it again.
+
+DEFAULT_MARGIN = 10  # Voxels added on each side of the liver+tumor bounding box
+
+
+class CroppedCase:
+    def __init__(self, ct, segmentation, offset, full_shape, zooms=None, slice_counts=None):
+        self.ct = ct
+        self.segmentation = segmentation
+        self.offset = tuple(int(o) for o in offset)          # Start of the crop in the full volume
+        self.full_shape = tuple(int(n) for n in full_shape)  # Shape of the uncropped volume
+        self.zooms = zooms
+        self.slice_counts = slice_counts                     # build_slice_index() of the full segmentation
+
+    @property
+    def slices(self):
+        # Index of the crop inside the full volume
+        return tuple(slice(o, o + n) for o, n in zip(self.offset, self.ct.shape))
+
+    @property
+    def fraction(self):
+        return self.ct.size / float(np.prod(self.full_shape))
+
+    def to_full(self, index):
+        # Convert a (x, y, z) index inside the crop to full-volume coordinates
+        return tuple(int(i) + o for i, o in zip(index, self.offset))
+
+
+# === Bounding box of all labeled voxels (axis projections a z-slab at a time) ===
+def roi_bounds(segmentation, margin=DEFAULT_MARGIN):
+    return bounding_box(segmentation, margin=margin)
+
+
+def crop_case(ct, segmentation, margin=DEFAULT_MARGIN, zooms=None):
+    bounds = roi_bounds(segmentation, margin)
+    if bounds is None:
+        # Nothing labeled: keep an empty crop so callers still see zero voxels
+        bounds = tuple(slice(0, 0) for _ in segmentation.shape)
+    return CroppedCase(np.array(ct[bounds]), np.array(segmentation[bounds]),
+                       [b.start for b in bounds], segmentation.shape, zooms)
+
+
+# === Stored crops ===
+def crop_path(volume_path, crop_folder):
+    key = hashlib.sha1(os.path.abspath(volume_path).encode('utf-8')).hexdigest()[:16]
+    return sidecar_path(volume_path, f"-{key}.roi.npz", crop_folder)
+
+
+def load_cropped_case(volume_path, segmentation_path, crop_folder, margin=DEFAULT_MARGIN, cache=None, workers=None):
+    path = crop_path(volume_path, crop_folder)
+    fingerprint = file_fingerprint(volume_path) + file_fingerprint(segmentation_path) + (margin,)
+
+    # Missing, unreadable, stale or older crops (without slice counts) are rebuilt
+    data = read_npz(path, fingerprint)
+    if data is not None and 'slice_counts' in data:
+        return CroppedCase(data['ct'], data['segmentation'], data['offset'], data['full_shape'], data['zooms'],
+                           data['slice_counts'])
+
+    volume, segmentation, vol_img, seg_img = load_case(volume_path, segmentation_path, cache, workers)
+    zooms = np.asarray(vol_img.header.get_zooms()[:3], dtype=np.float64)
+    crop = crop_case(volume, segmentation, margin, zooms)
+    crop.slice_counts = build_slice_index(segmentation)
+
+    os.makedirs(crop_folder, exist_ok=True)
+    write_npz(path, fingerprint, ct=crop.ct, segmentation=crop.segmentation, offset=np.asarray(crop.offset),
+              full_shape=np.asarray(crop.full_shape), zooms=zooms, slice_counts=crop.slice_counts)
+    return crop
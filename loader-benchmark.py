@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import tempfile
+import multiprocessing as mp
+from synthetic_cases import make_synthetic_cases, list_cases
+
+# === Benchmark: get_fdata() float64 vs. lits_io native integer loaders ===
+# Each loader runs in a fresh process so the peak RSS of one does not hide the other.
+
+# === Set path to the folder containing all volumes and segmentations ===
+# Leave as None (or point at a missing folder) to benchmark on synthetic LiTS-sized cases
+data_folder = None
+n_cases = 3              # Number of cases to load per run
+synthetic_slices = 600   # Slices per synthetic volume (LiTS ranges from ~75 to ~990)
+
+
+# === Peak resident memory of the current process in MB ===
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 ** 2
+
+
+# === Loaders under test ===
+def load_fdata(vol_path, seg_path):
+    import nibabel as nib
+    return nib.load(vol_path).get_fdata(), nib.load(seg_path).get_fdata()
+
+
+def load_native(vol_path, seg_path):
+    from lits_io import load_case
+    volume, segmentation, _, _ = load_case(vol_path, seg_path)
+    return volume, segmentation
+
+
+LOADERS = {
+    'get_fdata (float64)': load_fdata,
+    'lits_io (int16/uint8)': load_native,
+}
+
+
+def run_loader(name, pairs, queue):
+    import nibabel  # noqa: F401  (import before measuring the baseline)
+    import lits_io  # noqa: F401
+
+    loader = LOADERS[name]
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    nbytes = 0
+    for vol_path, seg_path in pairs:
+        volume, segmentation = loader(vol_path, seg_path)
+        nbytes += volume.nbytes + segmentation.nbytes
+        del volume, segmentation
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, baseline, peak_rss_mb(), nbytes / len(pairs) / 1024 ** 2))
+
+
+def benchmark(pairs):
+    ctx = mp.get_context('spawn')
+    print(f"Benchmarking {len(pairs)} case(s)\n")
+    print(f"{'Loader':<24}{'Load time (s)':>15}{'s/case':>10}{'Array MB/case':>15}{'Peak RSS (MB)':>15}{'RSS above baseline':>20}")
+    for name in LOADERS:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_loader, args=(name, pairs, queue))
+        proc.start()
+        elapsed, baseline, peak, array_mb = queue.get()
+        proc.join()
+        print(f"{name:<24}{elapsed:>15.2f}{elapsed / len(pairs):>10.2f}{array_mb:>15.1f}{peak:>15.1f}{peak - baseline:>20.1f}")
+
+
+if __name__ == '__main__':
+    if data_folder and os.path.isdir(data_folder):
+        benchmark(list_cases(data_folder, n_cases))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"Writing {n_cases} synthetic 512x512x{synthetic_slices} case(s) to {tmp}...")
+            benchmark(make_synthetic_cases(tmp, n_cases, synthetic_slices))
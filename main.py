@@ -1,6 +1,7 @@
-import SimpleITK as sitk
 import matplotlib.pyplot as plt
 import os
+from lits_io import load_slice
+from volume_pyramid import load_level
 
 # Define paths for training and testing datasets
 training_dataset_path = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training_Batch1\media\nas\01_Datasets\CT\LITS\Training Batch 1'
@@ -9,22 +10,25 @@ testing_dataset_path = r'C:\Users\hasmy065\OneDrive - University of South Austra
 # Choose which dataset to process
 dataset_path = training_dataset_path  # Change to testing_dataset_path if needed
 
+# Preview from a stored 2x/4x/8x pyramid level (built once next to each file, see volume_pyramid.py)
+# instead of the full-resolution slice; None keeps full resolution
+preview_factor = None
+
 # Iterate through all files in the directory
 for filename in os.listdir(dataset_path):
     if filename.endswith('.nii') or filename.endswith('.nii.gz'):  # Check for NIfTI files
         file_path = os.path.join(dataset_path, filename)
         
-        # Load the image using SimpleITK
-        image = sitk.ReadImage(file_path)
-        
-        # Convert to a NumPy array
-        image_array = sitk.GetArrayFromImage(image)
-        
-        # Visualize the middle slice (change slice index if needed)
-        middle_slice = image_array[image_array.shape[0] // 2]
+        if preview_factor:
+            # Middle slice of the memory-mapped coarse level
+            level, zooms = load_level(file_path, preview_factor)
+            middle_slice = level[:, :, level.shape[2] // 2]
+        else:
+            # Read only the middle axial slice (change slice index if needed) instead of the whole volume
+            middle_slice, image = load_slice(file_path)
         
-        # Plot the middle slice
-        plt.imshow(middle_slice, cmap='gray')
+        # Plot the middle slice (transposed to the row/column layout SimpleITK used)
+        plt.imshow(middle_slice.T, cmap='gray')
         plt.title(f'Middle Slice of {filename}')
         plt.axis('off')
         plt.show()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+import re
+import json
+import nibabel as nib
+import numpy as np
+from lits_io import write_json
+
+# Header-only dataset manifest keyed by LiTS case ID.
+#
+# build_manifest() scans a folder once, reads only the NIfTI header of every
+# volume-<id>.nii(.gz) / segmentation-<id>.nii(.gz) file, and stores the result as
+# one JSON table next to the data:
+#   {case_id: {'volume': entry, 'segmentation': entry}}
+# where each entry records path, shape, zooms, dtype, affine, file size and mtime.
+# Re-running it only re-reads headers of files whose size or mtime changed, and the
+# returned dict gives O(1) lookups by case ID instead of pairing sorted file lists.
+
+MANIFEST_NAME = 'lits_manifest.json'
+CASE_PATTERN = re.compile(r'^(volume|segmentation)-(\d+)\.nii(\.gz)?$')
+
+
+# === Manifest entry for a single file (header only, no voxel data) ===
+def read_header_entry(path, stat=None):
+    stat = stat or os.stat(path)
+    img = nib.load(path)
+    return {
+        'path': os.path.abspath(path),
+        'file': os.path.basename(path),
+        'shape': [int(n) for n in img.shape],
+        'zooms': [float(z) for z in img.header.get_zooms()],
+        'dtype': str(img.get_data_dtype()),
+        'affine': np.asarray(img.affine).tolist(),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+# === Persistence ===
+def load_manifest(manifest_path):
+    with open(manifest_path, 'r') as f:
+        cases = json.load(f)['cases']
+    return {int(case_id): case for case_id, case in cases.items()}
+
+
+def save_manifest(manifest, manifest_path):
+    write_json(manifest_path, {'cases': {str(case_id): manifest[case_id] for case_id in sorted(manifest)}}, indent=1)
+
+
+# === Incremental build ===
+def build_manifest(data_folder, manifest_path=None, verbose=False):
+    manifest_path = manifest_path or os.path.join(data_folder, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        try:
+            previous = load_manifest(manifest_path)
+        except (OSError, ValueError, KeyError):
+            previous = {}  # Corrupt or old-format manifest; rebuild from scratch
+
+    manifest = {}
+    reread = 0
+    for dir_entry in os.scandir(data_folder):
+        match = CASE_PATTERN.match(dir_entry.name)
+        if not match or not dir_entry.is_file():
+            continue
+        kind, case_id = match.group(1), int(match.group(2))
+        stat = dir_entry.stat()
+
+        old = previous.get(case_id, {}).get(kind)
+        if (old is not None and old['file'] == dir_entry.name
+                and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns):
+            entry = dict(old, path=os.path.abspath(dir_entry.path))
+        else:
+            entry = read_header_entry(dir_entry.path, stat)
+            reread += 1
+        manifest.setdefault(case_id, {})[kind] = entry
+
+    if reread or manifest != previous:
+        save_manifest(manifest, manifest_path)
+    if verbose:
+        print(f"Manifest: {len(manifest)} cases, {reread} header(s) re-read")
+    return manifest
+
+
+# === Lookups ===
+def paired_case_ids(manifest):
+    # Case IDs that have both a volume and a segmentation, in numeric order
+    return sorted(case_id for case_id, case in manifest.items() if 'volume' in case and 'segmentation' in case)
+
+
+def case_ids_with(manifest, kind):
+    return sorted(case_id for case_id, case in manifest.items() if kind in case)
+
+
+def case_path(manifest, case_id, kind):
+    entry = manifest.get(case_id, {}).get(kind)
+    return entry['path'] if entry is not None else None
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+from lits_io import load_segmentation, file_fingerprint, sidecar_path, read_npz, write_npz
+
+# Compact run-length storage for LiTS segmentation masks.
+#
+# LiTS label maps only hold 0 (background), 1 (liver) and 2 (tumor), so they compress
+# into a few thousand runs per slice. RLEMask stores them as runs along each axial
+# slice (x fastest, then y, matching nibabel's Fortran order), with the run offsets of
+# every slice kept separately. Per-label voxel counts, per-slice label presence and
+# bounding boxes are computed directly from the runs without decoding the mask.
+
+N_LABELS = 3
+RLE_SUFFIX = '.rle.npz'
+
+
+class RLEMask:
+    def __init__(self, shape, values, lengths, slice_offsets, zooms=None, affine=None, fingerprint=None):
+        self.shape = tuple(int(n) for n in shape)
+        self.values = values                # uint8 label of each run
+        self.lengths = lengths              # uint32 length of each run
+        self.slice_offsets = slice_offsets  # int64, runs of slice z are [offsets[z], offsets[z + 1])
+        self.zooms = zooms
+        self.affine = affine
+        self.fingerprint = fingerprint
+
+    @property
+    def slice_size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def n_slices(self):
+        return self.shape[2]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.lengths.nbytes + self.slice_offsets.nbytes
+
+    # === Queries that never decode the mask ===
+    def label_counts(self, n_labels=N_LABELS):
+        return np.bincount(self.values, weights=self.lengths, minlength=n_labels).astype(np.int64)
+
+    def _run_slices(self):
+        return np.repeat(np.arange(self.n_slices), np.diff(self.slice_offsets))
+
+    def slice_counts(self, n_labels=N_LABELS):
+        # (n_slices x n_labels) voxel counts of every label on every axial slice
+        n_labels = max(n_labels, int(self.values.max()) + 1 if self.values.size else 0)
+        keys = self._run_slices() * n_labels + self.values
+        counts = np.bincount(keys, weights=self.lengths, minlength=self.n_slices * n_labels)
+        return counts.astype(np.int64).reshape(self.n_slices, n_labels)
+
+    def slice_presence(self, label):
+        return self.slice_counts()[:, label] > 0
+
+    def bounding_box(self, label):
+        # Box of `label` as slices (stop exclusive, like bounding_boxes.py), or None if absent
+        nx = self.shape[0]
+        starts = np.cumsum(self.lengths, dtype=np.int64) - self.lengths
+        run_slices = self._run_slices()
+        selected = self.values == label
+        if not selected.any():
+            return None
+
+        start = starts[selected] - run_slices[selected] * self.slice_size
+        end = start + self.lengths[selected].astype(np.int64) - 1
+        z = run_slices[selected]
+        y_start, y_end = start // nx, end // nx
+        # A run that wraps onto the next row covers both x = nx - 1 and x = 0
+        wraps = y_end > y_start
+        x_low = np.where(wraps, 0, start % nx)
+        x_high = np.where(wraps, nx - 1, end % nx)
+        return (slice(int(x_low.min()), int(x_high.max()) + 1), slice(int(y_start.min()), int(y_end.max()) + 1),
+                slice(int(z.min()), int(z.max()) + 1))
+
+    # === Decoding ===
+    def decode_slice(self, z):
+        first, last = self.slice_offsets[z], self.slice_offsets[z + 1]
+        flat = np.repeat(self.values[first:last], self.lengths[first:last])
+        return flat.reshape(self.shape[:2], order='F')
+
+    def decode(self):
+        return np.repeat(self.values, self.lengths).reshape(self.shape, order='F')
+
+    # === Persistence ===
+    def save(self, path):
+        extras = {}
+        if self.zooms is not None:
+            extras['zooms'] = np.asarray(self.zooms, dtype=np.float64)
+        if self.affine is not None:
+            extras['affine'] = np.asarray(self.affine, dtype=np.float64)
+        write_npz(path, self.fingerprint, shape=np.asarray(self.shape, dtype=np.int64), values=self.values,
+                  lengths=self.lengths, slice_offsets=self.slice_offsets, **extras)
+
+    @classmethod
+    def from_arrays(cls, data):
+        # Rebuild a mask from the arrays stored by save()
+        return cls(data['shape'], data['values'], data['lengths'], data['slice_offsets'],
+                   zooms=data.get('zooms'), affine=data.get('affine'),
+                   fingerprint=tuple(int(v) for v in data['fingerprint']) if 'fingerprint' in data else None)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_arrays({name: data[name] for name in data.files})
+
+
+# === Encoding ===
+def encode(segmentation, zooms=None, affine=None, slab=64):
+    # Encode slab by slab so only a few slices of temporary change flags exist at once
+    segmentation = np.asarray(segmentation)
+    if segmentation.ndim != 3:
+        raise ValueError("Expected a 3D segmentation array")
+    if segmentation.size and segmentation.max() > np.iinfo(np.uint8).max:
+        raise ValueError("Labels must fit in uint8")
+
+    nx, ny, nz = segmentation.shape
+    slice_size = nx * ny
+    values, lengths, run_slices = [], [], []
+    for z0 in range(0, nz, slab):
+        block = segmentation[:, :, z0:z0 + slab]
+        flat = block.ravel(order='F')
+        change = flat[1:] != flat[:-1]
+        change[slice_size - 1::slice_size] = True  # Every slice starts a new run
+        starts = np.concatenate(([0], np.flatnonzero(change) + 1))
+        values.append(flat[starts].astype(np.uint8))
+        lengths.append(np.diff(np.append(starts, flat.size)).astype(np.uint32))
+        run_slices.append(starts // slice_size + z0)
+
+    run_slices = np.concatenate(run_slices) if run_slices else np.zeros(0, dtype=np.int64)
+    slice_offsets = np.concatenate(([0], np.cumsum(np.bincount(run_slices, minlength=nz)))).astype(np.int64)
+    return RLEMask((nx, ny, nz),
+                   np.concatenate(values) if values else np.zeros(0, dtype=np.uint8),
+                   np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.uint32),
+                   slice_offsets, zooms=zooms, affine=affine)
+
+
+# === Sidecar files (<segmentation>.rle.npz), rebuilt when the source file changes ===
+def rle_path(segmentation_path, rle_folder=None):
+    return sidecar_path(segmentation_path, RLE_SUFFIX, rle_folder)
+
+
+def load_or_encode(segmentation_path, rle_folder=None, cache=None):
+    # Missing, unreadable and stale sidecars are all re-encoded
+    path = rle_path(segmentation_path, rle_folder)
+    fingerprint = file_fingerprint(segmentation_path)
+    data = read_npz(path, fingerprint)
+    if data is not None and {'shape', 'values', 'lengths', 'slice_offsets'} <= set(data):
+        return RLEMask.from_arrays(data)
+
+    segmentation, seg_img = load_segmentation(segmentation_path, cache)
+    mask = encode(segmentation, zooms=seg_img.header.get_zooms()[:3], affine=seg_img.affine)
+    mask.fingerprint = fingerprint
+    if rle_folder:
+        os.makedirs(rle_folder, exist_ok=True)
+    mask.save(path)
+    return mask
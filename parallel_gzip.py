@@ -0,0 +1,119 @@
+import os
+import gzip
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import nibabel as nib
+import numpy as np
+import lits_io  # Module import: lits_io itself imports this module
+
+# Parallel decompression of .nii.gz files.
+#
+# A normal .nii.gz is a single deflate stream, so it can only be inflated on one core.
+# recompress() rewrites a file once as a sequence of independent gzip members (one per
+# BLOCK_SIZE bytes of uncompressed data) and records the member sizes in a small
+# "<file>.blocks.json" index. The result is still a valid .nii.gz that nibabel and
+# every other tool can read, but read_unscaled() can now inflate the members on
+# several threads at once (zlib releases the GIL while it works).
+
+BLOCK_SIZE = 4 * 1024 ** 2  # 4 MB of uncompressed data per gzip member
+INDEX_SUFFIX = '.blocks.json'
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _compress_block(block, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip member
+    return compressor.compress(block) + compressor.flush()
+
+
+# === One-time re-compression into block-indexed gzip ===
+def recompress(src_path, dst_path=None, block_size=BLOCK_SIZE, workers=None, level=6):
+    # dst_path=None rewrites the file in place
+    dst_path = dst_path or src_path
+    workers = workers or default_workers()
+    blocks = []
+
+    # The source is closed before the finished file replaces it (dst_path may be src_path)
+    with lits_io.atomic_write(dst_path) as dst, gzip.open(src_path, 'rb') as src, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            block = src.read(block_size)
+            if block:
+                pending.append((len(block), pool.submit(_compress_block, block, level)))
+            # Keep at most 2 blocks per worker in flight to bound memory
+            while pending and (not block or len(pending) >= 2 * workers):
+                u_len, future = pending.popleft()
+                member = future.result()
+                dst.write(member)
+                blocks.append([len(member), u_len])
+            if not block:
+                break
+
+    size, mtime_ns = lits_io.file_fingerprint(dst_path)
+    index = {'block_size': block_size, 'blocks': blocks, 'size': size, 'mtime_ns': mtime_ns}
+    lits_io.write_json(dst_path + INDEX_SUFFIX, index)
+    return dst_path
+
+
+# === Index lookup ===
+def read_index(path):
+    # Return the block index of `path`, or None if there is none or the file has changed since
+    index = lits_io.read_json(path + INDEX_SUFFIX)
+    if index is None or (index['size'], index['mtime_ns']) != lits_io.file_fingerprint(path):
+        return None
+    return index
+
+
+def has_index(path):
+    return read_index(path) is not None
+
+
+# === Parallel read ===
+def decompress(path, workers=None, index=None):
+    index = index or read_index(path)
+    if index is None:
+        return None
+    with open(path, 'rb') as f:
+        compressed = memoryview(f.read())
+
+    jobs = []
+    c_off = u_off = 0
+    for c_len, u_len in index['blocks']:
+        jobs.append((c_off, c_len, u_off, u_len))
+        c_off += c_len
+        u_off += u_len
+    out = bytearray(u_off)
+
+    def inflate(job):
+        c_off, c_len, u_off, u_len = job
+        out[u_off:u_off + u_len] = zlib.decompress(compressed[c_off:c_off + c_len], 31)
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        list(pool.map(inflate, jobs))
+    return out
+
+
+def read_unscaled(path, workers=None):
+    # Return (raw array, slope, intercept) exactly as stored, or None if `path` has no
+    # valid block index (callers then fall back to nibabel's single-threaded reader)
+    data = decompress(path, workers)
+    if data is None:
+        return None
+
+    sizeof_hdr = int(np.frombuffer(data, dtype='<i4', count=1)[0])
+    if sizeof_hdr not in (348, 540):
+        sizeof_hdr = int(np.frombuffer(data, dtype='>i4', count=1)[0])
+    header_class = nib.Nifti2Header if sizeof_hdr == 540 else nib.Nifti1Header
+    header = header_class(binaryblock=bytes(data[:sizeof_hdr]))  # Extensions are not needed here
+
+    shape = header.get_data_shape()
+    raw = np.ndarray(shape, dtype=header.get_data_dtype(), buffer=data,
+                     offset=int(header.get_data_offset()), order='F')
+    slope, inter = header.get_slope_inter()
+    slope = 1.0 if slope is None else float(slope)
+    inter = 0.0 if inter is None else float(inter)
+    return raw, slope, inter
@@ -0,0 +1,51 @@
+import os
+import time
+import numpy as np
+import parallel_gzip
+from lits_io import load_ct
+from manifest import build_manifest
+
+# === One-time re-compression of the dataset into block-indexed gzip ===
+# Files stay valid .nii.gz (nibabel, ITK-SNAP, etc. still open them), but the lits_io
+# loaders can then inflate them on several threads when called with `workers`.
+
+# === Set path to the folder containing all volumes and segmentations ===
+data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training Dataset'
+
+workers = parallel_gzip.default_workers()
+
+
+def recompress_dataset(manifest):
+    for case_id in sorted(manifest):
+        for kind, entry in sorted(manifest[case_id].items()):
+            path = entry['path']
+            if not path.endswith('.gz') or parallel_gzip.has_index(path):
+                continue
+            start = time.perf_counter()
+            parallel_gzip.recompress(path, workers=workers)
+            print(f"Recompressed {entry['file']} in {time.perf_counter() - start:.1f} s")
+
+
+# === Compare single-threaded and parallel load latency on one case ===
+def compare_load_times(path):
+    start = time.perf_counter()
+    serial, _ = load_ct(path)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel, _ = load_ct(path, workers=workers)
+    parallel_time = time.perf_counter() - start
+
+    if not np.array_equal(serial, parallel):
+        raise ValueError(f"Parallel read of {path} does not match nibabel!")
+    print(f"{os.path.basename(path)}: nibabel {serial_time:.2f} s, "
+          f"{workers} threads {parallel_time:.2f} s ({serial_time / parallel_time:.1f}x)")
+
+
+recompress_dataset(build_manifest(data_folder))
+
+# Re-read the manifest: recompression changed file sizes and mtimes
+manifest = build_manifest(data_folder)
+first_case = manifest[min(manifest)]
+if 'volume' in first_case:
+    compare_load_times(first_case['volume']['path'])
@@ -0,0 +1,79 @@
+import os
+import pickle
+import hashlib
+import inspect
+import functools
+import numpy as np
+from lits_io import file_fingerprint, atomic_write
+
+# Result cache for per-case analysis functions.
+#
+# Decorate an analysis function with @cached(paths=(...)) and call configure(folder)
+# once to enable it. Each call is keyed by the function name, the size and mtime of
+# every input file named in `paths`, and the values of all other parameters; the
+# result is pickled under that key. Re-running a study with unchanged inputs and
+# parameters then only reads the pickles. Parameters listed in `ignore` (volume
+# caches, worker counts, ...) do not affect results and are left out of the key.
+# Bump `version` when the function's output changes so old entries are not reused.
+
+_cache_folder = None
+
+
+def configure(cache_folder):
+    # None disables the cache (every call recomputes)
+    global _cache_folder
+    _cache_folder = cache_folder
+    if cache_folder:
+        os.makedirs(cache_folder, exist_ok=True)
+
+
+def _param_key(value):
+    if isinstance(value, np.ndarray):
+        return ('ndarray', value.dtype.str, value.shape, hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return tuple(_param_key(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _param_key(v)) for k, v in value.items()))
+    return repr(value)
+
+
+def cache_key(name, version, arguments, paths):
+    parts = [name, version]
+    for param, value in sorted(arguments.items()):
+        if param in paths and value is not None:
+            parts.append((param, os.path.abspath(value), file_fingerprint(value)))
+        else:
+            parts.append((param, _param_key(value)))
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+def cached(paths=(), ignore=(), version=1):
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _cache_folder is None:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k not in ignore}
+            key = cache_key(name, version, arguments, paths)
+            entry_path = os.path.join(_cache_folder, name, key + '.pkl')
+
+            try:
+                with open(entry_path, 'rb') as f:
+                    return pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+            result = func(*args, **kwargs)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with atomic_write(entry_path) as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            return result
+
+        return wrapper
+    return decorator
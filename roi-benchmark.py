@@ -0,0 +1,60 @@
+import os
+import time
+import tempfile
+import numpy as np
+from lits_io import load_case, voxel_volume_ml
+from liver_roi import crop_case, DEFAULT_MARGIN
+from case_stats import compute_region_stats
+from synthetic_cases import make_synthetic_cases, list_cases
+
+# === Benchmark: liver/tumor statistics on the full volume vs. the liver ROI crop ===
+
+# === Set path to the folder containing all volumes and segmentations ===
+# Leave as None (or point at a missing folder) to benchmark on synthetic LiTS-sized cases
+data_folder = None
+n_cases = 3
+repeats = 3
+synthetic_slices = 400
+
+
+def time_stats(volume, segmentation, voxel_ml):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for label in (1, 2):
+            compute_region_stats(volume, segmentation, label, 50, voxel_ml)
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark(pairs):
+    print(f"{'Case':<24}{'ROI fraction':>14}{'Crop (s)':>10}{'Full stats (s)':>16}{'ROI stats (s)':>15}{'Speedup':>9}")
+    for vol_path, seg_path in pairs:
+        volume, segmentation, vol_img, _ = load_case(vol_path, seg_path)
+        voxel_ml = voxel_volume_ml(vol_img)
+
+        start = time.perf_counter()
+        crop = crop_case(volume, segmentation, DEFAULT_MARGIN)
+        crop_time = time.perf_counter() - start
+
+        full_time = time_stats(volume, segmentation, voxel_ml)
+        roi_time = time_stats(crop.ct, crop.segmentation, voxel_ml)
+
+        # Same voxels, same answer
+        for label in (1, 2):
+            full = compute_region_stats(volume, segmentation, label, 50, voxel_ml)
+            roi = compute_region_stats(crop.ct, crop.segmentation, label, 50, voxel_ml)
+            if full['voxels'] != roi['voxels'] or not np.array_equal(full['hist_counts'], roi['hist_counts']):
+                raise ValueError(f"ROI statistics differ from the full volume for {vol_path}")
+
+        print(f"{os.path.basename(vol_path):<24}{crop.fraction:>14.1%}{crop_time:>10.2f}"
+              f"{full_time:>16.3f}{roi_time:>15.3f}{full_time / roi_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    if data_folder and os.path.isdir(data_folder):
+        benchmark(list_cases(data_folder, n_cases))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"Writing {n_cases} synthetic 512x512x{synthetic_slices} case(s) to {tmp}...")
+            # Liver covering roughly 8% of the volume, with one tumor inside it
+            benchmark(make_synthetic_cases(tmp, n_cases, synthetic_slices, liver_box=((180, 360), (120, 330)),
+                                           tumor_box=((220, 260), (180, 230)), liver_z=(1 / 3, 2 / 3), compressed=False))
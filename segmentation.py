@@ -1,45 +1,62 @@
-import SimpleITK as sitk
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-from scipy.ndimage import label, find_objects
+from scipy.ndimage import label
+from lits_io import load_slice
+from volume_pyramid import load_level, level_to_full
+from bounding_boxes import label_bounding_boxes
 
 # Define paths for training and testing datasets
 training_dataset_path = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training_Batch1\media\nas\01_Datasets\CT\LITS\Training Batch 1'
 
+# Threshold a coarse pyramid level (see volume_pyramid.py) first to locate the liver, then
+# refine at full resolution only inside that region (e.g. 4); None thresholds the whole slice
+coarse_factor = None
+
 # Function to segment liver using thresholding
 def segment_liver(image_array):
     # Adjust thresholds based on the printed intensity range
     liver_mask = (image_array > 100) & (image_array < 300)  # Example adjusted thresholds
     return liver_mask
 
+# Full-resolution (x, y, z) region around the largest thresholded component of a coarse level
+def coarse_liver_roi(file_path, factor, full_shape):
+    level, zooms = load_level(file_path, factor)
+    labeled_array, num_features = label(segment_liver(np.asarray(level)))
+    if num_features == 0:
+        return None
+    largest = np.argmax(np.bincount(labeled_array.ravel())[1:])
+    coarse_slices = label_bounding_boxes(labeled_array)[largest + 1]
+    return level_to_full(coarse_slices, factor, full_shape)
+
 # Iterate through all files in the directory
 for filename in os.listdir(training_dataset_path):
     if filename.endswith('.nii') or filename.endswith('.nii.gz'):  # Check for NIfTI files
         file_path = os.path.join(training_dataset_path, filename)
         
-        # Load the image using SimpleITK
-        image = sitk.ReadImage(file_path)
-        
-        # Convert to a NumPy array
-        image_array = sitk.GetArrayFromImage(image)
-        
-        # Segment the liver
-        liver_mask = segment_liver(image_array)
+        # Read only the middle axial slice, transposed to the row/column layout SimpleITK used
+        original_middle_slice, image = load_slice(file_path)
+        original_middle_slice = original_middle_slice.T
         
         # Visualize the original middle slice
-        original_middle_slice = image_array[image_array.shape[0] // 2]
         plt.imshow(original_middle_slice, cmap='gray')
         plt.title(f'Original Middle Slice of {filename}')
         plt.axis('off')
         plt.show()
         
-        # Visualize the liver mask middle slice
-        middle_slice = liver_mask[liver_mask.shape[0] // 2]
+        # Segment the liver on the middle slice only (the rest of the mask was never displayed)
+        if coarse_factor:
+            # Threshold only the part of the slice inside the coarse liver region (rows = y, columns = x)
+            roi = coarse_liver_roi(file_path, coarse_factor, image.shape[:3])
+            middle_slice = np.zeros(original_middle_slice.shape, dtype=bool)
+            if roi is not None and roi[2].start <= image.shape[2] // 2 < roi[2].stop:
+                middle_slice[roi[1], roi[0]] = segment_liver(original_middle_slice[roi[1], roi[0]])
+        else:
+            middle_slice = segment_liver(original_middle_slice)
         
         # Find connected components and bounding boxes
         labeled_array, num_features = label(middle_slice)
-        slices = find_objects(labeled_array)
+        slices = label_bounding_boxes(labeled_array).values()
         
         # Plot the liver mask with bounding boxes
         plt.imshow(middle_slice, cmap='gray')
@@ -0,0 +1,35 @@
+import SimpleITK as sitk
+import numpy as np
+
+# Zero-copy NumPy access to SimpleITK images.
+#
+# sitk.GetArrayFromImage copies every voxel into a new buffer, doubling peak memory for
+# scripts that only read the data. sitk.GetArrayViewFromImage avoids the copy, but the
+# view points into the image's own buffer and becomes invalid (use-after-free) as soon
+# as the image is garbage collected. array_view() wraps the view so that the returned
+# array's .base holds a reference to the image: the image lives exactly as long as any
+# array derived from it, and the array is read-only.
+
+
+class _ImageBuffer:
+    def __init__(self, image):
+        self.image = image
+        view = sitk.GetArrayViewFromImage(image)
+        interface = dict(view.__array_interface__)
+        interface['data'] = (interface['data'][0], True)  # Never let callers write into ITK's buffer
+        self.__array_interface__ = interface
+
+
+def array_view(image):
+    # Read-only (z, y, x) array sharing memory with `image`
+    return np.asarray(_ImageBuffer(image))
+
+
+def read_array_view(path):
+    image = sitk.ReadImage(path)
+    return array_view(image), image
+
+
+def voxel_volume_ml(image):
+    # Voxel size in mm³ converted to mL
+    return float(np.prod(image.GetSpacing()[:3])) / 1000
@@ -0,0 +1,67 @@
+import os
+import math
+import time
+import matplotlib.pyplot as plt
+from lits_io import load_ct_slice, load_segmentation_slice
+from volume_cache import VolumeCache
+from manifest import build_manifest, case_ids_with, case_path
+from slice_index import read_slice_index, best_slice
+
+# === Set path to the folder containing all volumes and segmentations ===
+data_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Training Dataset'
+
+# === Set path to the output folder ===
+output_folder = r'C:\Users\hasmy065\OneDrive - University of South Australia\Projects\LiTS-Dataset\Slice_Gallery'
+os.makedirs(output_folder, exist_ok=True)  # Create the folder if it doesn't exist
+
+# === Optional memory-mapped cache of uncompressed volumes (None disables it) ===
+# Cached cases are previewed straight from the memmap; others are read through nibabel's
+# array proxy, which only decodes the requested slice.
+cache_folder = None  # e.g. r'C:\LiTS-Cache'
+cache = VolumeCache(cache_folder) if cache_folder else None
+
+cases_per_page = 24
+columns = 6
+
+# === Look up volume files by case ID (header-only manifest) ===
+manifest = build_manifest(data_folder)
+case_ids = case_ids_with(manifest, 'volume')
+
+
+# === Build a gallery of axial slices with the liver/tumor overlay ===
+# Cases whose segmentation already has a per-slice index (see slice_index.py) show the
+# slice with the most liver; the others show the middle slice. The index is only read,
+# never built here, so the gallery never decodes a whole segmentation.
+def build_gallery(manifest, case_ids, output_folder):
+    start = time.perf_counter()
+    for page, first in enumerate(range(0, len(case_ids), cases_per_page)):
+        page_ids = case_ids[first:first + cases_per_page]
+        rows = math.ceil(len(page_ids) / columns)
+        plt.figure(figsize=(3 * columns, 3 * rows))
+
+        for i, case_id in enumerate(page_ids):
+            vol_path = case_path(manifest, case_id, 'volume')
+            seg_path = case_path(manifest, case_id, 'segmentation')
+
+            counts = read_slice_index(seg_path) if seg_path is not None else None
+            slice_idx = best_slice(counts) if counts is not None else None  # None reads the middle slice
+            ct_slice, vol_img = load_ct_slice(vol_path, slice_idx, cache)
+            plt.subplot(rows, columns, i + 1)
+            plt.imshow(ct_slice.T, cmap='gray', vmin=-200, vmax=300)
+            if seg_path is not None:
+                seg_slice, seg_img = load_segmentation_slice(seg_path, slice_idx, cache)
+                plt.imshow(seg_slice.T, cmap='jet', alpha=0.3, vmin=0, vmax=2)
+            plt.title(os.path.basename(vol_path), fontsize=8)
+            plt.axis('off')
+
+        output_file = os.path.join(output_folder, f'Slice_Gallery-{page}.png')
+        plt.tight_layout()
+        plt.savefig(output_file, dpi=150)
+        plt.close()
+        print(f"Gallery page saved to: {output_file}")
+
+    print(f"Previewed {len(case_ids)} cases in {time.perf_counter() - start:.1f} s")
+
+
+# === Run the gallery ===
+build_gallery(manifest, case_ids, output_folder)
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+from lits_io import load_segmentation, file_fingerprint, sidecar_path, read_npz, write_npz
+
+# Per-slice label presence index.
+#
+# "Which axial slices contain liver or tumor?" used to mean scanning the whole mask, or
+# falling back to the middle slice, which often has no liver at all. build_slice_index()
+# counts the voxels of each label in every axial slice once, in a single bincount per
+# z-slab, and load_slice_index() keeps the (n_slices x 3) result in a small
+# "<segmentation>.slices.npz" sidecar that is rebuilt when the source file's size or
+# mtime changes. Best-slice selection, slice sampling and tumor triage then only read
+# this array.
+
+INDEX_SUFFIX = '.slices.npz'
+N_LABELS = 3
+LIVER, TUMOR = 1, 2
+
+
+# === Building ===
+def build_slice_index(segmentation, n_labels=N_LABELS, slab=32):
+    # counts[z, label] = number of voxels of `label` in axial slice z of an (x, y, z) mask
+    n_slices = segmentation.shape[2]
+    counts = np.zeros((n_slices, n_labels), dtype=np.int64)
+    for z0 in range(0, n_slices, slab):
+        labels = np.asarray(segmentation[:, :, z0:z0 + slab]).astype(np.int64)
+        labels = np.minimum(labels, n_labels - 1)  # Unexpected larger labels count as the last one
+        depth = labels.shape[2]
+        joint = labels + n_labels * np.arange(depth)[None, None, :]
+        counts[z0:z0 + depth] = np.bincount(joint.ravel(), minlength=depth * n_labels).reshape(depth, n_labels)
+    return counts
+
+
+# === Sidecar files ===
+def index_path(segmentation_path, index_folder=None):
+    return sidecar_path(segmentation_path, INDEX_SUFFIX, index_folder)
+
+
+def read_slice_index(segmentation_path, index_folder=None):
+    # Return the stored counts, or None if the sidecar is missing or stale (never builds it)
+    data = read_npz(index_path(segmentation_path, index_folder), file_fingerprint(segmentation_path))
+    return data['counts'] if data is not None else None
+
+
+def load_slice_index(segmentation_path, index_folder=None, cache=None, segmentation=None):
+    # Return the stored counts, rebuilding them if missing or stale. Pass an already
+    # loaded full `segmentation` to avoid reading the file again when a rebuild is needed.
+    counts = read_slice_index(segmentation_path, index_folder)
+    if counts is not None:
+        return counts
+
+    fingerprint = file_fingerprint(segmentation_path)
+    if segmentation is None:
+        segmentation, _ = load_segmentation(segmentation_path, cache)
+    counts = build_slice_index(segmentation)
+
+    if index_folder:
+        os.makedirs(index_folder, exist_ok=True)
+    write_npz(index_path(segmentation_path, index_folder), fingerprint, counts=counts)
+    return counts
+
+
+# === Queries ===
+def slices_with(counts, label=LIVER):
+    return np.flatnonzero(counts[:, label])
+
+
+def best_slice(counts, label=LIVER):
+    # Axial slice with the most voxels of `label`, or the middle slice if it never occurs
+    if not counts[:, label].any():
+        return counts.shape[0] // 2
+    return int(np.argmax(counts[:, label]))
+
+
+def sample_slices(counts, n, labels=(LIVER, TUMOR), seed=None):
+    # Up to `n` distinct slices (sorted) that contain any of `labels`, e.g. for training patches
+    candidates = np.flatnonzero(counts[:, list(labels)].any(axis=1))
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(candidates, size=min(n, candidates.size), replace=False))
+
+
+def has_tumor(counts):
+    return bool(counts[:, TUMOR].any())
+
+
+def label_voxels(counts):
+    # Total voxels per label for the whole case
+    return counts.sum(axis=0)
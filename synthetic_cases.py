@@ -0,0 +1,43 @@
+import os
+import numpy as np
+
+# Synthetic LiTS-sized cases for the benchmark scripts.
+#
+# Each case is a 512 x 512 x n_slices int16 CT volume of random HU values and a uint8
+# segmentation with one box of liver (label 1) and one box of tumor (label 2) inside it,
+# saved as volume-<i>/segmentation-<i> NIfTI files with 0.7 x 0.7 x 1.0 mm voxels.
+# In-plane boxes are ((x_start, x_stop), (y_start, y_stop)); the liver spans `liver_z`
+# (fractions of the slice count) and the tumor `tumor_slices` slices from the middle.
+
+LIVER_BOX = ((150, 350), (150, 400))
+TUMOR_BOX = ((200, 240), (200, 260))
+
+
+def make_synthetic_cases(folder, count, n_slices, liver_box=LIVER_BOX, tumor_box=TUMOR_BOX, liver_z=(1 / 4, 3 / 4),
+                         tumor_slices=20, compressed=True):
+    import nibabel as nib
+
+    rng = np.random.default_rng(0)
+    affine = np.diag([0.7, 0.7, 1.0, 1.0])
+    ext = '.nii.gz' if compressed else '.nii'
+    pairs = []
+    for i in range(count):
+        volume = rng.integers(-1024, 1500, size=(512, 512, n_slices), dtype=np.int16)
+        segmentation = np.zeros((512, 512, n_slices), dtype=np.uint8)
+        (x0, x1), (y0, y1) = liver_box
+        segmentation[x0:x1, y0:y1, int(n_slices * liver_z[0]):int(n_slices * liver_z[1])] = 1
+        (x0, x1), (y0, y1) = tumor_box
+        segmentation[x0:x1, y0:y1, n_slices // 2:n_slices // 2 + tumor_slices] = 2
+
+        vol_path = os.path.join(folder, f'volume-{i}{ext}')
+        seg_path = os.path.join(folder, f'segmentation-{i}{ext}')
+        nib.save(nib.Nifti1Image(volume, affine), vol_path)
+        nib.save(nib.Nifti1Image(segmentation, affine), seg_path)
+        pairs.append((vol_path, seg_path))
+    return pairs
+
+
+def list_cases(folder, count):
+    # The first `count` (volume, segmentation) path pairs of a LiTS folder
+    volume_files = sorted([f for f in os.listdir(folder) if 'volume' in f and (f.endswith('.nii') or f.endswith('.nii.gz'))])
+    return [(os.path.join(folder, f), os.path.join(folder, f.replace('volume', 'segmentation'))) for f in volume_files[:count]]
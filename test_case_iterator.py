@@ -0,0 +1,63 @@
+import threading
+import time
+from case_iterator import CasePrefetcher
+
+CASE_BYTES = 100
+
+
+class _LiveBytes:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def change(self, delta):
+        with self._lock:
+            self.current += delta
+            self.peak = max(self.peak, self.current)
+
+
+class _FakeCase:
+    # Counts its bytes as live from creation until it is garbage collected
+    def __init__(self, live, nbytes):
+        self.live = live
+        self.nbytes = nbytes
+        live.change(nbytes)
+
+    def __del__(self):
+        self.live.change(-self.nbytes)
+
+
+def _run(max_bytes, depth=2, n_cases=8):
+    live = _LiveBytes()
+
+    def load(item):
+        case = _FakeCase(live, CASE_BYTES)  # A real read holds its memory from the start
+        time.sleep(0.02)
+        return case
+
+    cases = CasePrefetcher(range(n_cases), load, depth, max_bytes, lambda item: CASE_BYTES)
+    seen = []
+    for item, case in cases:
+        time.sleep(0.001)  # Reads are slower than the loop body, so read-ahead always hits the budget
+        seen.append(item)
+    return seen, live
+
+
+def test_budget_caps_live_cases():
+    # Room for three cases: the one in the loop body, the next one and one read ahead
+    seen, live = _run(max_bytes=3 * CASE_BYTES, depth=4)
+    assert seen == list(range(8))
+    assert live.peak <= 3 * CASE_BYTES
+
+
+def test_budget_of_two_cases_still_progresses():
+    seen, live = _run(max_bytes=2 * CASE_BYTES, depth=4)
+    assert seen == list(range(8))
+    assert live.peak <= 2 * CASE_BYTES
+
+
+def test_all_cases_released():
+    seen, live = _run(max_bytes=None, depth=3)
+    assert seen == list(range(8))
+    assert live.current == 0
@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import nibabel as nib
+from census import run_census
+
+
+def _write_cases(folder, n_cases=3):
+    # Small LiTS-like volume/segmentation pairs with different shapes and HU ranges
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n_cases):
+        shape = (24 + 4 * i, 20, 10 + 3 * i)
+        volume = rng.integers(-1024, 1200 + 300 * i, size=shape).astype(np.int16)
+        segmentation = np.zeros(shape, dtype=np.uint8)
+        segmentation[4:16, 5:15, 2:8] = 1
+        segmentation[6:9, 7:10, 3:5 + i] = 2
+        affine = np.diag([0.7 + 0.1 * i, 0.7, 1.5, 1.0])
+        for name, data in (('volume', volume), ('segmentation', segmentation)):
+            path = os.path.join(folder, f'{name}-{i}.nii.gz')
+            nib.save(nib.Nifti1Image(data, affine), path)
+            paths.append(path)
+    return paths
+
+
+def _assert_same(a, b):
+    assert a['files'] == b['files'] and a['voxels'] == b['voxels']
+    for kind in ('ct', 'labels'):
+        assert a[kind]['files'] == b[kind]['files']
+        assert a[kind]['voxels'] == b[kind]['voxels']
+        assert a[kind]['histogram'].items() == b[kind]['histogram'].items()
+    assert np.array_equal(a['labels']['ml'], b['labels']['ml'])
+    assert [name for name, _, _ in a['labels']['cases']] == [name for name, _, _ in b['labels']['cases']]
+    for (_, counts_a, ml_a), (_, counts_b, ml_b) in zip(a['labels']['cases'], b['labels']['cases']):
+        assert np.array_equal(counts_a, counts_b) and np.array_equal(ml_a, ml_b)
+
+
+def test_parallel_and_stored_runs_match_serial(tmp_path):
+    paths = _write_cases(str(tmp_path))
+    serial = run_census(paths)
+    assert serial['read'] == len(paths) and serial['reused'] == 0
+
+    _assert_same(run_census(paths, workers=2), serial)
+
+    store = str(tmp_path / 'partials')
+    first = run_census(paths, workers=2, store_folder=store)
+    again = run_census(paths, workers=2, store_folder=store)
+    assert first['read'] == len(paths)
+    assert again['read'] == 0 and again['reused'] == len(paths)
+    _assert_same(first, serial)
+    _assert_same(again, serial)
+
+
+def test_stored_run_drops_removed_files(tmp_path):
+    paths = _write_cases(str(tmp_path))
+    store = str(tmp_path / 'partials')
+    run_census(paths, store_folder=store)
+    fewer = run_census(paths[:-2], store_folder=store)
+    assert fewer['removed'] == 2 and fewer['reused'] == len(paths) - 2
+    _assert_same(fewer, run_census(paths[:-2]))
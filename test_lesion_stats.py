@@ -0,0 +1,79 @@
+import numpy as np
+from scipy import ndimage
+from lesion_index import build_lesion_index, lesion_slices
+from lesion_stats import lesion_table
+from liver_roi import crop_case
+
+BINS = 30
+
+
+def _case(seed):
+    # A liver block with scattered tumor voxels (many small lesions, some touching the liver)
+    rng = np.random.default_rng(seed)
+    segmentation = np.zeros((48, 40, 32), dtype=np.uint8)
+    segmentation[8:40, 6:34, 4:28] = 1
+    segmentation[(rng.random(segmentation.shape) > 0.93) & (segmentation == 1)] = 2
+    volume = rng.normal(60, 40, segmentation.shape).astype(np.int16)
+    return segmentation, volume
+
+
+def _expected(lesions, segmentation, volume, min_label):
+    # Per-lesion numpy on the full volume: the lesion's voxels are the component of the
+    # bounding-box crop that contains its seed
+    rows = []
+    for lesion in lesions:
+        box = lesion_slices(lesion)
+        labeled, _ = ndimage.label(segmentation[box] >= min_label)
+        seed = tuple(s - start for s, (start, _) in zip(lesion['seed'], lesion['bbox']))
+        values = volume[box][labeled == labeled[seed]].astype(np.float64)
+        counts, edges = np.histogram(values, BINS)
+        rows.append((values.size, values.mean(), values.std(), values.min(), values.max(), counts, edges))
+    return rows
+
+
+def _check(table, expected):
+    assert len(table['lesion']) == len(expected)
+    for i, (voxels, mean, std, min_hu, max_hu, counts, edges) in enumerate(expected):
+        assert table['voxels'][i] == voxels
+        assert np.isclose(table['mean_hu'][i], mean, rtol=1e-12, atol=1e-9)
+        assert np.isclose(table['std_hu'][i], std, rtol=1e-9, atol=1e-9)
+        assert table['min_hu'][i] == min_hu
+        assert table['max_hu'][i] == max_hu
+        assert np.array_equal(table['hist_counts'][i], counts)
+        assert np.array_equal(table['hist_edges'][i], edges)
+
+
+def test_matches_numpy_on_full_volume():
+    for seed in range(3):
+        segmentation, volume = _case(seed)
+        for min_label in (1, 2):
+            lesions = build_lesion_index(segmentation, min_label)['lesions']
+            table, _ = lesion_table(lesions, segmentation, volume, voxel_ml=0.001, bins=BINS, min_label=min_label)
+            _check(table, _expected(lesions, segmentation, volume, min_label))
+
+
+def test_matches_numpy_on_roi_crop():
+    segmentation, volume = _case(7)
+    crop = crop_case(volume, segmentation, margin=2)
+    assert crop.fraction < 1
+    for min_label in (1, 2):
+        # Index built from the crop, stored in full-volume coordinates like the sidecar
+        lesions = build_lesion_index(crop.segmentation, min_label, crop.offset)['lesions']
+        full_lesions = build_lesion_index(segmentation, min_label)['lesions']
+        for key in ('label', 'bbox', 'voxels', 'seed'):
+            assert [lesion[key] for lesion in lesions] == [lesion[key] for lesion in full_lesions]
+        table, _ = lesion_table(lesions, crop.segmentation, crop.ct, bins=BINS, min_label=min_label, offset=crop.offset)
+        full, _ = lesion_table(lesions, segmentation, volume, bins=BINS, min_label=min_label)
+        _check(table, _expected(lesions, segmentation, volume, min_label))
+        for key in full:
+            assert np.array_equal(table[key], full[key])
+
+
+def test_flat_lesion_histogram():
+    # A lesion with a single HU value gets np.histogram's widened [v - 0.5, v + 0.5] range
+    segmentation = np.zeros((6, 6, 6), dtype=np.uint8)
+    segmentation[1:3, 1:3, 1:3] = 2
+    volume = np.full(segmentation.shape, 35, dtype=np.int16)
+    lesions = build_lesion_index(segmentation, 2)['lesions']
+    table, _ = lesion_table(lesions, segmentation, volume, bins=BINS, min_label=2)
+    _check(table, _expected(lesions, segmentation, volume, 2))
@@ -0,0 +1,70 @@
+import os
+import gzip
+import numpy as np
+import nibabel as nib
+from concurrent.futures import ThreadPoolExecutor
+from lits_io import scaling, to_labels, file_fingerprint, read_json, write_json
+
+# Early-exit tumor presence scan.
+#
+# Asking "does this segmentation contain any tumor?" does not need the whole mask.
+# has_tumor() streams the raw (optionally gzipped) NIfTI data a few axial slices at a
+# time (LiTS arrays are stored x-fastest, so every axial slice is one contiguous run of
+# bytes) and stops at the first chunk that holds a label-2 voxel. Cases with tumor
+# usually stop well before the end of the file; only tumor-free cases read it all.
+# scan_tumor_cases() runs the scan over many files on a thread pool (zlib releases the
+# GIL while inflating) and remembers each answer in a small JSON file keyed by the
+# file's size and mtime, so repeated runs answer instantly.
+
+TUMOR_LABEL = 2
+CHUNK_SLICES = 16
+
+
+def has_tumor(path, chunk_slices=CHUNK_SLICES, label=TUMOR_LABEL):
+    img = nib.load(path)  # Header only
+    shape = img.shape[:3]
+    dtype = img.get_data_dtype()
+    slope, inter = scaling(img)
+    offset = int(img.dataobj.offset)
+    slice_voxels = shape[0] * shape[1]
+    slice_bytes = slice_voxels * dtype.itemsize
+    extra = int(np.prod(img.shape[3:], dtype=np.int64))  # Any 4th dimension follows the 3D block
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        f.seek(offset)
+        for z0 in range(0, shape[2] * extra, chunk_slices):
+            depth = min(chunk_slices, shape[2] * extra - z0)
+            data = f.read(slice_bytes * depth)
+            if len(data) < slice_bytes * depth:
+                raise ValueError(f"{path} is truncated")
+            chunk = np.frombuffer(data, dtype=dtype)
+            if np.any(to_labels(chunk, slope, inter) == label):
+                return True
+    return False
+
+
+def scan_tumor_cases(paths, workers=8, cache_file=None, chunk_slices=CHUNK_SLICES):
+    # {path: True/False} for every segmentation in `paths`. Answers stored in `cache_file`
+    # are reused while the file's size and mtime are unchanged.
+    stored = (read_json(cache_file) if cache_file is not None else None) or {}
+
+    results, to_scan = {}, []
+    for path in paths:
+        size, mtime_ns = file_fingerprint(path)
+        entry = stored.get(os.path.abspath(path))
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            results[path] = entry['has_tumor']
+        else:
+            to_scan.append(path)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for path, found in zip(to_scan, pool.map(lambda p: has_tumor(p, chunk_slices), to_scan)):
+            results[path] = found
+            size, mtime_ns = file_fingerprint(path)
+            stored[os.path.abspath(path)] = {'size': size, 'mtime_ns': mtime_ns, 'has_tumor': found}
+
+    if cache_file is not None and to_scan:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+        write_json(cache_file, stored)
+    return results
@@ -0,0 +1,112 @@
+import os
+import time
+import hashlib
+import numpy as np
+from lits_io import atomic_write, source_fields, read_json, write_json
+
+# Opt-in cache of uncompressed volumes for .nii.gz inputs.
+#
+# The first time a volume or segmentation is requested it is decoded once and written
+# as a raw, uncompressed file (data starts at offset 0, so it is page-aligned) next to
+# a small JSON description. Later runs open that file with np.memmap instead of
+# decompressing the .nii.gz again. An entry is rebuilt when the size or mtime of its
+# source file changes, and the least recently used entries are evicted once the cache
+# grows past `max_bytes`.
+
+DEFAULT_MAX_BYTES = 50 * 1024 ** 3  # 50 GB
+
+
+class VolumeCache:
+    def __init__(self, cache_folder, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        os.makedirs(cache_folder, exist_ok=True)
+
+    # === Entry locations ===
+    def _entry_paths(self, path, kind):
+        key = hashlib.sha1(f"{os.path.abspath(path)}|{kind}".encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_folder, key)
+        return base + '.raw', base + '.json'
+
+    def _open(self, data_path, meta):
+        return np.memmap(data_path, dtype=np.dtype(meta['dtype']), mode='r',
+                         shape=tuple(meta['shape']), order=meta['order'])
+
+    # === Lookup ===
+    def lookup(self, path, kind):
+        # Return a read-only memmap of `path` if a valid entry exists, otherwise None
+        data_path, meta_path = self._entry_paths(path, kind)
+        meta = read_json(meta_path, path)
+
+        if meta is not None and os.path.exists(data_path) and os.path.getsize(data_path) == meta['nbytes']:
+            meta['last_used'] = time.time()
+            write_json(meta_path, meta)
+            return self._open(data_path, meta)
+        return None
+
+    def get(self, path, kind, build):
+        # Return a read-only memmap of `path`, calling build() to decode it on a miss
+        cached = self.lookup(path, kind)
+        if cached is not None:
+            return cached
+
+        data_path, meta_path = self._entry_paths(path, kind)
+        fields = source_fields(path)
+        array = np.asanyarray(build())
+        order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+        meta = {
+            'source': os.path.abspath(path),
+            **fields,
+            'kind': kind,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'order': order,
+            'nbytes': int(array.nbytes),
+            'last_used': time.time(),
+        }
+
+        # Written through a temporary file so an interrupted run never leaves a torn entry
+        with atomic_write(data_path, 'w+b') as f:
+            out = np.memmap(f, dtype=array.dtype, mode='w+', shape=array.shape, order=order)
+            out[...] = array
+            out.flush()
+            del out
+        write_json(meta_path, meta)
+
+        self.evict(keep=meta_path)
+        return self._open(data_path, meta)
+
+    # === Size cap with LRU eviction ===
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.cache_folder):
+            if name.endswith('.json'):
+                meta_path = os.path.join(self.cache_folder, name)
+                meta = read_json(meta_path)
+                if meta is not None:
+                    entries.append((meta['last_used'], meta['nbytes'], meta_path))
+        return entries
+
+    def total_bytes(self):
+        return sum(nbytes for _, nbytes, _ in self.entries())
+
+    def evict(self, keep=None):
+        entries = sorted(self.entries())
+        total = sum(nbytes for _, nbytes, _ in entries)
+        for _, nbytes, meta_path in entries:
+            if total <= self.max_bytes:
+                break
+            if meta_path == keep:
+                continue
+            try:
+                os.remove(meta_path[:-len('.json')] + '.raw')
+                os.remove(meta_path)
+            except OSError:
+                continue  # Still memory-mapped by someone (Windows); try again next time
+            total -= nbytes
+
+    def clear(self):
+        for _, _, meta_path in self.entries():
+            for entry_path in (meta_path[:-len('.json')] + '.raw', meta_path):
+                if os.path.exists(entry_path):
+                    os.remove(entry_path)
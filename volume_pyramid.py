@@ -0,0 +1,124 @@
+import os
+import numpy as np
+from lits_io import load_ct, load_segmentation, sidecar_path, atomic_write, source_fields, read_json, write_json
+
+# Multi-resolution pyramid of each volume for fast previews and coarse-first processing.
+#
+# build_pyramid() stores 2x/4x/8x downsampled copies of a CT (block mean, rounded back
+# to int16 HU) or of a label map (block mode, ties go to the higher label so small
+# tumors are not swallowed by liver) in a "<file>.pyramid" folder next to the original.
+# Levels are plain .npy files, so load_level() memory-maps them instantly. Blocks at
+# the far edge of the volume only use the voxels that exist. The pyramid is rebuilt
+# when the source file's size or mtime changes.
+
+FACTORS = (2, 4, 8)
+PYRAMID_SUFFIX = '.pyramid'
+META_NAME = 'pyramid.json'
+N_LABELS = 3
+_PAD_LABEL = 255  # Never a real label, so padding is not counted by the mode
+
+
+def _kind(path):
+    return 'seg' if 'segmentation' in os.path.basename(path) else 'ct'
+
+
+def _level_shape(shape, factor):
+    return tuple(-(-n // factor) for n in shape)
+
+
+# === Block reductions, a few output slices at a time to bound memory ===
+def _blocks(array, factor, pad_value):
+    # Pad to a multiple of `factor` and expose (nx, f, ny, f, nz, f) blocks
+    pad = [(0, -n % factor) for n in array.shape]
+    if any(p for _, p in pad):
+        array = np.pad(array, pad, mode='constant', constant_values=pad_value)
+    nx, ny, nz = (n // factor for n in array.shape)
+    return array.reshape(nx, factor, ny, factor, nz, factor)
+
+
+def _block_sizes(n, factor):
+    # Number of real voxels in each block along one axis
+    starts = np.arange(0, n, factor)
+    return np.minimum(starts + factor, n) - starts
+
+
+def downsample_ct(ct, factor, slab=8):
+    shape = _level_shape(ct.shape, factor)
+    out = np.empty(shape, dtype=np.int16)
+    size_xy = np.multiply.outer(_block_sizes(ct.shape[0], factor), _block_sizes(ct.shape[1], factor))
+    size_z = _block_sizes(ct.shape[2], factor)
+    for z0 in range(0, shape[2], slab):
+        block = np.asarray(ct[:, :, z0 * factor:(z0 + slab) * factor], dtype=np.float32)
+        sums = _blocks(block, factor, 0).sum(axis=(1, 3, 5))
+        counts = size_xy[:, :, None] * size_z[None, None, z0:z0 + slab]
+        out[:, :, z0:z0 + slab] = np.rint(sums / counts)
+    return out
+
+
+def downsample_labels(segmentation, factor, slab=8, n_labels=N_LABELS):
+    shape = _level_shape(segmentation.shape, factor)
+    out = np.empty(shape, dtype=np.uint8)
+    for z0 in range(0, shape[2], slab):
+        blocks = _blocks(np.asarray(segmentation[:, :, z0 * factor:(z0 + slab) * factor]), factor, _PAD_LABEL)
+        counts = np.stack([(blocks == label).sum(axis=(1, 3, 5)) for label in range(n_labels)], axis=-1)
+        # argmax over the reversed labels picks the highest label among ties
+        out[:, :, z0:z0 + slab] = n_labels - 1 - np.argmax(counts[..., ::-1], axis=-1)
+    return out
+
+
+# === Stored pyramids ===
+def pyramid_folder_for(path, pyramid_folder=None):
+    # "<file>.pyramid" next to the original, or inside `pyramid_folder` if the data folder is read-only
+    return sidecar_path(path, PYRAMID_SUFFIX, pyramid_folder)
+
+
+def _level_file(folder, factor):
+    return os.path.join(folder, f"x{factor}.npy")
+
+
+def build_pyramid(path, factors=FACTORS, pyramid_folder=None, cache=None):
+    kind = _kind(path)
+    folder = pyramid_folder_for(path, pyramid_folder)
+    fields = source_fields(path)
+    data, img = load_segmentation(path, cache) if kind == 'seg' else load_ct(path, cache)
+
+    downsample = downsample_labels if kind == 'seg' else downsample_ct
+    os.makedirs(folder, exist_ok=True)
+    for factor in factors:
+        level = downsample(data, factor)
+        with atomic_write(_level_file(folder, factor)) as f:
+            np.save(f, level)
+
+    meta = {
+        'kind': kind,
+        **fields,
+        'shape': [int(n) for n in data.shape],
+        'zooms': [float(z) for z in img.header.get_zooms()[:3]],
+        'factors': sorted(int(f) for f in factors),
+    }
+    write_json(os.path.join(folder, META_NAME), meta)  # Written last: its presence means every level is complete
+    return meta
+
+
+def load_pyramid_meta(path, factors=FACTORS, pyramid_folder=None, cache=None):
+    # Stored metadata, (re)building the pyramid if it is missing, stale or lacks a level
+    meta = read_json(os.path.join(pyramid_folder_for(path, pyramid_folder), META_NAME), path)
+    if meta is None or not set(factors) <= set(meta['factors']):
+        meta = build_pyramid(path, sorted(set(FACTORS) | set(factors)), pyramid_folder, cache)
+    return meta
+
+
+def load_level(path, factor, pyramid_folder=None, cache=None):
+    # Return (level, zooms): the memory-mapped downsampled (x, y, z) array and its voxel size in mm
+    if factor == 1:
+        data, img = load_segmentation(path, cache) if _kind(path) == 'seg' else load_ct(path, cache)
+        return data, tuple(float(z) for z in img.header.get_zooms()[:3])
+    meta = load_pyramid_meta(path, (factor,), pyramid_folder, cache)
+    level = np.load(_level_file(pyramid_folder_for(path, pyramid_folder), factor), mmap_mode='r')
+    return level, tuple(z * factor for z in meta['zooms'])
+
+
+# === Mapping a coarse region back to full resolution ===
+def level_to_full(slices, factor, full_shape):
+    # Slices in a level -> the full-resolution slices they cover
+    return tuple(slice(s.start * factor, min(s.stop * factor, n)) for s, n in zip(slices, full_shape))